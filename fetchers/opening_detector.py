@@ -41,7 +41,6 @@ class OpeningDetector:
             return None
 
         board = chess.Board()
-        last_booked_board = board.copy()
 
         with chess.polyglot.open_reader(self.book_path) as reader:
             for ply, move in enumerate(moves):
@@ -59,16 +58,16 @@ class OpeningDetector:
                         book_moves=book_moves,
                     )
 
-                last_booked_board = board.copy()
                 if move not in board.legal_moves:
                     logger.warning("Skipping game with illegal move %s at ply %d", move.uci(), ply)
                     return None
                 board.push(move)
 
-        # All moves were in the book
+        # All moves were in the book; report the position before the last one
+        board.pop()
         return DeviationResult(
             deviation_ply=len(moves),
             deviating_side="none",
-            board_at_deviation=last_booked_board,
+            board_at_deviation=board,
             is_fully_booked=True,
         )
@@ -5,6 +5,30 @@ import chess
 import chess.pgn
 
 
+class _MainlineVisitor(chess.pgn.BaseVisitor):
+    """Collects headers and mainline moves without building a GameNode tree."""
+
+    def begin_game(self):
+        self.headers = {}
+        self.moves = []
+
+    def visit_header(self, tagname, tagvalue):
+        self.headers[tagname] = tagvalue
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def visit_move(self, board, move):
+        self.moves.append(move)
+
+    def handle_error(self, error):
+        # Same as chess.pgn.GameBuilder: log and keep the moves parsed so far
+        chess.pgn.LOGGER.error("%s while parsing PGN", error)
+
+    def result(self):
+        return self
+
+
 class PGNParser:
     """Parses PGN strings into move lists and board positions."""
 
@@ -19,7 +43,7 @@ class PGNParser:
             return None
 
         try:
-            game = chess.pgn.read_game(io.StringIO(pgn_string))
+            game = chess.pgn.read_game(io.StringIO(pgn_string), Visitor=_MainlineVisitor)
         except Exception:
             return None
         if game is None:
@@ -34,8 +58,7 @@ class PGNParser:
         ):
             return None
 
-        moves = list(game.mainline_moves())
-        return moves if moves else None
+        return game.moves if game.moves else None
 
     @staticmethod
     def parse_moves_with_clocks(pgn_string):
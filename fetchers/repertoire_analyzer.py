@@ -1,11 +1,14 @@
 # repertoire_analyzer.py
 
 import logging
+import queue
+import sys
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
-from threading import Lock
 from typing import List, Optional
 
+import chess.polyglot
+
 from game_utils import game_result
 from pgn_parser import PGNParser
 from stockfish_evaluator import StockfishEvaluator
@@ -13,7 +16,7 @@ from stockfish_evaluator import StockfishEvaluator
 logger = logging.getLogger(__name__)
 
 
-@dataclass
+@dataclass(slots=True)
 class OpeningEvaluation:
     """Evaluation of a single game's opening phase."""
     eco_code: Optional[str]
@@ -36,10 +39,22 @@ class OpeningEvaluation:
     opponent_name: str = ""     # opponent username
     end_time: object = None     # datetime of game end
 
+    def __post_init__(self):
+        # Thousands of evaluations share a few hundred ECO codes and names;
+        # interning stores each distinct string once.
+        if self.eco_code:
+            self.eco_code = sys.intern(self.eco_code)
+        if self.eco_name:
+            self.eco_name = sys.intern(self.eco_name)
+
 
-@dataclass
+@dataclass(slots=True)
 class OpeningStats:
-    """Aggregated statistics for one opening played as one color."""
+    """Aggregated statistics for one opening played as one color.
+
+    Running totals only, so memory per opening stays constant however many
+    games are aggregated into it.
+    """
     eco_code: Optional[str]
     eco_name: str
     color: str
@@ -49,7 +64,6 @@ class OpeningStats:
     max_eval: int = 0
     total_deviation_ply: int = 0
     player_deviated_count: int = 0
-    evaluations: List[int] = field(default_factory=list)
 
     @property
     def avg_eval(self):
@@ -74,14 +88,20 @@ class RepertoireAnalyzer:
         self.opening_detector = opening_detector
         self.stockfish_evaluator = stockfish_evaluator
 
-    def _compute_eval_loss(self, deviation, eval_before_cp, evaluator, color):
+    def _compute_eval_loss(self, deviation, eval_result, evaluator, color):
         """Compute centipawn loss of the played move.
 
         Returns eval_before - eval_after (positive = player lost centipawns).
-        Returns 0 for fully booked games or when played_move is None.
+        Returns 0 for fully booked games, when played_move is None, or when
+        the played move is the engine's best move (no second evaluation).
         """
         if deviation.is_fully_booked or deviation.played_move is None:
             return 0
+        # If the played move matches the engine's best move, eval_loss is 0 by definition.
+        # Computing it via two separate evaluations can produce noise from search depth variance.
+        if deviation.played_move == eval_result.best_move:
+            return 0
+        eval_before_cp = eval_result.score_for_color(color)
         board_after = deviation.board_at_deviation.copy()
         board_after.push(deviation.played_move)
         eval_after = evaluator.evaluate(board_after)
@@ -115,16 +135,8 @@ class RepertoireAnalyzer:
             logger.warning("Skipping game %s: engine error", getattr(game, 'game_url', 'unknown'))
             return None
         eval_cp = eval_result.score_for_color(game.my_color)
-
-        # If the played move matches the engine's best move, eval_loss is 0 by definition.
-        # Computing it via two separate evaluations can produce noise from search depth variance.
-        played_uci = deviation.played_move.uci() if deviation.played_move else None
-        best_uci = eval_result.best_move.uci() if eval_result.best_move else None
-        if played_uci and played_uci == best_uci:
-            eval_loss_cp = 0
-        else:
-            eval_loss_cp = self._compute_eval_loss(
-                deviation, eval_cp, self.stockfish_evaluator, game.my_color)
+        eval_loss_cp = self._compute_eval_loss(
+            deviation, eval_result, self.stockfish_evaluator, game.my_color)
 
         eco_name = game.eco_name or "Unknown Opening"
         if eco_name.lower().startswith("undefined"):
@@ -171,29 +183,27 @@ class RepertoireAnalyzer:
 
     @staticmethod
     def _aggregate(stats, evaluation):
-        """Add a single evaluation into the stats dict."""
+        """Add a single evaluation into the stats dict (running totals, O(1))."""
         key = f"{evaluation.eco_code or 'Unknown'}_{evaluation.my_color}"
+        eval_cp = evaluation.eval_cp
 
-        if key not in stats:
-            stats[key] = OpeningStats(
+        entry = stats.get(key)
+        if entry is None:
+            entry = stats[key] = OpeningStats(
                 eco_code=evaluation.eco_code,
                 eco_name=evaluation.eco_name,
                 color=evaluation.my_color,
-                times_played=0,
-                total_eval=0,
-                min_eval=evaluation.eval_cp,
-                max_eval=evaluation.eval_cp,
-                total_deviation_ply=0,
-                player_deviated_count=0,
+                min_eval=eval_cp,
+                max_eval=eval_cp,
             )
 
-        entry = stats[key]
         entry.times_played += 1
-        entry.total_eval += evaluation.eval_cp
-        entry.min_eval = min(entry.min_eval, evaluation.eval_cp)
-        entry.max_eval = max(entry.max_eval, evaluation.eval_cp)
+        entry.total_eval += eval_cp
+        if eval_cp < entry.min_eval:
+            entry.min_eval = eval_cp
+        elif eval_cp > entry.max_eval:
+            entry.max_eval = eval_cp
         entry.total_deviation_ply += evaluation.deviation_ply
-        entry.evaluations.append(evaluation.eval_cp)
 
         if evaluation.deviating_side == evaluation.my_color:
             entry.player_deviated_count += 1
@@ -260,9 +270,8 @@ class RepertoireAnalyzer:
             if eval_result is None:
                 logger.warning("Skipping game %s: engine error", getattr(game, 'game_url', 'unknown'))
                 continue
-            eval_cp = eval_result.score_for_color(game.my_color)
             eval_loss_cp = self._compute_eval_loss(
-                deviation, eval_cp, self.stockfish_evaluator, game.my_color)
+                deviation, eval_result, self.stockfish_evaluator, game.my_color)
             evaluation = self._make_evaluation(
                 game, deviation, eval_result, eval_loss_cp, moves)
             self._aggregate(stats, evaluation)
@@ -271,47 +280,53 @@ class RepertoireAnalyzer:
         return new_evals
 
     def _analyze_parallel(self, prepared, total, progress_callback, workers, stats):
-        """Evaluate positions in parallel using multiple Stockfish instances."""
-        new_evals = []
-        completed = [0]  # list so closure can mutate
-        lock = Lock()
+        """Evaluate positions in parallel using multiple Stockfish instances.
 
-        def evaluate_batch(batch, engine):
-            """Worker: evaluate a batch sequentially on one engine, report per-game."""
-            batch_evals = []
-            for game, deviation, moves in batch:
+        One long-lived engine is started per worker and reused for every game
+        that worker pulls from the shared queue. Workers only evaluate; they
+        hand each game's outcome back through a results queue that this
+        thread drains, so aggregation and progress_callback run here and in
+        completion order, without a lock.
+        """
+        # Games that deviate at the same position go to the same worker as
+        # one unit, so its engine's position cache evaluates that position once.
+        by_position = {}
+        for item in prepared:
+            by_position.setdefault(
+                chess.polyglot.zobrist_hash(item[1].board_at_deviation), []).append(item)
+        work = queue.Queue()
+        for group in by_position.values():
+            work.put(group)
+
+        results = queue.Queue()  # (game, OpeningEvaluation or None), one per game
+
+        def evaluate_worker(engine):
+            """Worker: pull position groups off the shared queue until it is empty."""
+            while True:
                 try:
-                    eval_result = engine.evaluate(deviation.board_at_deviation)
-                    if eval_result is None:
-                        logger.warning("Skipping game %s: engine error", getattr(game, 'game_url', 'unknown'))
-                        with lock:
-                            completed[0] += 1
-                            if progress_callback:
-                                progress_callback(completed[0], total)
-                        continue
-                    eval_cp = eval_result.score_for_color(game.my_color)
-                    eval_loss_cp = self._compute_eval_loss(
-                        deviation, eval_cp, engine, game.my_color)
-                    evaluation = self._make_evaluation(
-                        game, deviation, eval_result, eval_loss_cp, moves)
-                    with lock:
-                        self._aggregate(stats, evaluation)
-                        new_evals.append((game, evaluation))
-                        completed[0] += 1
-                        if progress_callback:
-                            progress_callback(completed[0], total)
-                except Exception:
-                    logger.error("Error analyzing game %s", getattr(game, 'game_url', 'unknown'), exc_info=True)
-                    with lock:
-                        completed[0] += 1
-                        if progress_callback:
-                            progress_callback(completed[0], total)
-            return batch_evals
-
-        # Spawn one engine per worker thread
+                    group = work.get_nowait()
+                except queue.Empty:
+                    return
+                for game, deviation, moves in group:
+                    evaluation = None
+                    try:
+                        eval_result = engine.evaluate(deviation.board_at_deviation)
+                        if eval_result is None:
+                            logger.warning("Skipping game %s: engine error", getattr(game, 'game_url', 'unknown'))
+                        else:
+                            eval_loss_cp = self._compute_eval_loss(
+                                deviation, eval_result, engine, game.my_color)
+                            evaluation = self._make_evaluation(
+                                game, deviation, eval_result, eval_loss_cp, moves)
+                    except Exception:
+                        logger.error("Error analyzing game %s", getattr(game, 'game_url', 'unknown'), exc_info=True)
+                    results.put((game, evaluation))
+
+        # Spawn one engine per worker thread, but never more engines than
+        # there are position groups to hand out
         engines = []
         try:
-            for _ in range(workers):
+            for _ in range(min(workers, len(by_position))):
                 try:
                     eng = StockfishEvaluator(
                         self.stockfish_evaluator.stockfish_path,
@@ -326,18 +341,19 @@ class RepertoireAnalyzer:
                 logger.warning("No parallel engines started, falling back to sequential")
                 return self._analyze_sequential(prepared, total, progress_callback, stats)
 
-            # Split work into chunks based on actual engine count (round-robin)
-            actual_workers = len(engines)
-            chunks = [[] for _ in range(actual_workers)]
-            for i, item in enumerate(prepared):
-                chunks[i % actual_workers].append(item)
-
-            with ThreadPoolExecutor(max_workers=actual_workers) as pool:
-                futures = [
-                    pool.submit(evaluate_batch, chunk, engine)
-                    for chunk, engine in zip(chunks, engines)
-                    if chunk
-                ]
+            new_evals = []
+            # Each engine pulls the next game as soon as it is free, so a few
+            # slow positions don't leave the other engines idle.
+            with ThreadPoolExecutor(max_workers=len(engines)) as pool:
+                futures = [pool.submit(evaluate_worker, engine) for engine in engines]
+
+                for completed in range(1, total + 1):
+                    game, evaluation = results.get()
+                    if evaluation is not None:
+                        self._aggregate(stats, evaluation)
+                        new_evals.append((game, evaluation))
+                    if progress_callback:
+                        progress_callback(completed, total)
 
                 for future in as_completed(futures):
                     try:
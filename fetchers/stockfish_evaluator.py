@@ -1,15 +1,18 @@
 # stockfish_evaluator.py
 
 import logging
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Optional
 
 import chess
 import chess.engine
+import chess.polyglot
 
 logger = logging.getLogger(__name__)
 
 MATE_SCORE_CP = 10000  # centipawns used to represent mate
+EVAL_CACHE_SIZE = 100_000  # positions remembered per evaluator (LRU)
 
 
 @dataclass
@@ -33,10 +36,15 @@ class EvalResult:
 class StockfishEvaluator:
     """Evaluates chess positions using a Stockfish engine."""
 
-    def __init__(self, stockfish_path, depth=18):
+    def __init__(self, stockfish_path, depth=18, cache_size=EVAL_CACHE_SIZE):
         self.stockfish_path = stockfish_path
         self.depth = depth
+        self._limit = chess.engine.Limit(depth=depth)
         self._engine = None
+        # Position -> EvalResult, so positions repeated across games
+        # (common at opening deviations) hit the engine only once.
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
 
     def __enter__(self):
         logger.info("Starting Stockfish engine: %s (depth=%d)", self.stockfish_path, self.depth)
@@ -62,8 +70,16 @@ class StockfishEvaluator:
             logger.warning("Skipping invalid board position: %s", board.fen())
             return None
 
+        # Zobrist hash covers pieces, turn, castling and en passant but not the
+        # move counters, which don't affect the eval
+        key = (chess.polyglot.zobrist_hash(board), self.depth)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
         try:
-            info = self._engine.analyse(board, chess.engine.Limit(depth=self.depth))
+            info = self._engine.analyse(board, self._limit)
         except (chess.engine.EngineError, BrokenPipeError, TimeoutError, OSError) as e:
             logger.warning("Stockfish EngineError for FEN %s: %s", board.fen(), e)
             self._try_restart_engine()
@@ -87,12 +103,16 @@ class StockfishEvaluator:
             self._try_restart_engine()
             return None
 
-        return EvalResult(
+        result = EvalResult(
             score_cp=score_cp,
             score_mate=mate_in,
             depth=info.get("depth", self.depth),
             best_move=best_move,
         )
+        self._cache[key] = result
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        return result
 
     def _try_restart_engine(self):
         """Attempt to restart the engine after an error."""
@@ -27,6 +27,7 @@ def _make_items(n):
             'eco_name': f'Opening {i}',
             'eco_code': f'B{i:02d}',
             'color': 'white',
+            'card_class': '',
             'eval_loss_display': '-0.5',
             'eval_loss_class': 'bad',
             'eval_display': '+0.3',
@@ -39,10 +40,13 @@ def _make_items(n):
             'best_move_uci': 'd2d4',
             'played_move_uci': 'e2e4',
             'times_played': 3,
+            'times_class': 'recurring',
             'game_url': f'https://chess.com/game/{i}',
+            'game_link_detail': f'vs opponent{i}, blitz, January 1, 2026',
             'eval_loss_raw': 50 + i,
             'win_pct': 45,
             'loss_pct': 35,
+            'result_class': 'win-low',
             'time_class': 'blitz',
             'platform': 'chesscom',
             'opponent_name': f'opponent{i}',
@@ -4,10 +4,15 @@ import pytest
 from web.app import create_app
 
 
-@pytest.fixture
-def client():
+@pytest.fixture(scope='module')
+def app():
     app = create_app()
     app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
     with app.test_client() as client:
         yield client
 
@@ -19,22 +24,19 @@ def test_landing_returns_200(client):
 
 def test_landing_contains_brand(client):
     resp = client.get('/')
-    html = resp.data.decode()
-    assert 'Chess Coach' in html
-    assert 'AI' in html
+    assert b'Chess Coach' in resp.data
+    assert b'AI' in resp.data
 
 
 def test_landing_contains_form(client):
     resp = client.get('/')
-    html = resp.data.decode()
-    assert 'action="/analyze"' in html
-    assert 'method="POST"' in html
-    assert 'chesscom_username' in html
-    assert 'lichess_username' in html
+    assert b'action="/analyze"' in resp.data
+    assert b'method="POST"' in resp.data
+    assert b'chesscom_username' in resp.data
+    assert b'lichess_username' in resp.data
 
 
 def test_landing_contains_headline(client):
     resp = client.get('/')
-    html = resp.data.decode()
-    assert 'Find your opening weaknesses.' in html
-    assert 'Fix your endgame habits.' in html
+    assert b'Find your opening weaknesses.' in resp.data
+    assert b'Fix your endgame habits.' in resp.data
@@ -15,10 +15,16 @@ sys.modules.setdefault('db.models', _mock_db.models)
 from web.app import create_app  # noqa: E402
 
 
-@pytest.fixture
-def client():
+@pytest.fixture(scope='module')
+def app():
     app = create_app()
     app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    app.extensions['report_cache'].clear()
     with app.test_client() as c:
         yield c
 
@@ -124,10 +124,16 @@ def _mock_username_check():
         yield
 
 
-@pytest.fixture
-def client():
+@pytest.fixture(scope='module')
+def app():
     app = create_app()
     app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    app.extensions['report_cache'].clear()
     with app.test_client() as c:
         yield c
 
@@ -1,10 +1,23 @@
+import struct
+
 import chess
 import chess.polyglot
-from unittest.mock import patch, MagicMock
+import pytest
+from unittest.mock import MagicMock
 
 from opening_detector import OpeningDetector
 from helpers import starting_fen as _starting_fen, fen_after_moves as _fen_after_moves
 
+_START_FEN = _starting_fen()
+_FEN_AFTER_E4 = _fen_after_moves("e2e4")
+
+# OpeningDetector only stores the path; the book is opened per find_deviation
+# call (patched in TestCorruptBook), so one instance can serve those tests.
+_DETECTOR = OpeningDetector("dummy_path")
+
+# Reader handed out by the patched open_reader; tests install theirs via _set_fake.
+_current_fake = None
+
 
 def _make_entry(move):
     """Create a mock polyglot entry with the given move."""
@@ -18,14 +31,20 @@ class FakeReader:
 
     def __init__(self, book_moves_by_fen=None):
         """
-        book_moves_by_fen: dict mapping FEN (board only) → list of chess.Move
+        book_moves_by_fen: dict mapping FEN → list of chess.Move
         If None, defaults to empty (no book moves).
+
+        Positions are re-keyed by the board's transposition key (piece
+        bitboards, turn, castling rights, ep square) so lookups hash a small
+        tuple of ints rather than serialising the board.
         """
-        self.book_moves_by_fen = book_moves_by_fen or {}
+        self._book = {
+            chess.Board(fen)._transposition_key(): moves
+            for fen, moves in (book_moves_by_fen or {}).items()
+        }
 
     def find_all(self, board):
-        fen = board.fen()
-        moves = self.book_moves_by_fen.get(fen, [])
+        moves = self._book.get(board._transposition_key(), ())
         return [_make_entry(m) for m in moves]
 
     def __enter__(self):
@@ -35,225 +54,173 @@ class FakeReader:
         pass
 
 
+def _set_fake(fake):
+    """Make the patched open_reader return *fake* for the current test."""
+    global _current_fake
+    _current_fake = fake
 
-class TestFindDeviation:
-    def test_empty_moves_returns_none(self):
-        detector = OpeningDetector("dummy_path")
-        with patch("opening_detector.chess.polyglot.open_reader"):
-            assert detector.find_deviation([]) is None
 
-    def test_first_move_not_in_book(self):
-        """White plays a move not in the book on ply 0."""
-        fake = FakeReader(book_moves_by_fen={})  # empty book
+def _polyglot_move(move):
+    """Encode a move in polyglot's 16-bit layout (to | from << 6)."""
+    return move.to_square | (move.from_square << 6)
 
-        detector = OpeningDetector("dummy_path")
-        moves = [chess.Move.from_uci("e2e4")]
 
-        with patch("opening_detector.chess.polyglot.open_reader", return_value=fake):
-            result = detector.find_deviation(moves)
+@pytest.fixture
+def write_book(tmp_path):
+    """Return a function that writes a real polyglot .bin and returns its path.
 
-        assert result is not None
-        assert result.deviation_ply == 0
-        assert result.deviating_side == "white"
-        assert result.is_fully_booked is False
+    Takes a dict mapping FEN → list of chess.Move. Entries are sorted by
+    Zobrist key, as the polyglot reader bisects on it.
+    """
+    def write(book_moves_by_fen):
+        entries = sorted(
+            (chess.polyglot.zobrist_hash(chess.Board(fen)), _polyglot_move(m))
+            for fen, moves in book_moves_by_fen.items()
+            for m in moves
+        )
+        path = tmp_path / "book.bin"
+        path.write_bytes(b"".join(
+            struct.pack(">QHHI", key, raw_move, 1, 0) for key, raw_move in entries
+        ))
+        return str(path)
+    return write
 
-    def test_deviation_on_blacks_move(self):
-        """Book has 1.e4 but black plays something not in the book."""
-        book = {
-            _starting_fen(): [chess.Move.from_uci("e2e4")],
-            # No book entry for the position after 1.e4
-        }
-        fake = FakeReader(book_moves_by_fen=book)
 
-        detector = OpeningDetector("dummy_path")
-        moves = [chess.Move.from_uci("e2e4"), chess.Move.from_uci("c7c5")]
-
-        with patch("opening_detector.chess.polyglot.open_reader", return_value=fake):
-            result = detector.find_deviation(moves)
+def _uci(*moves):
+    return [chess.Move.from_uci(m) for m in moves]
 
-        assert result.deviation_ply == 1
-        assert result.deviating_side == "black"
-        assert result.is_fully_booked is False
 
-    def test_all_moves_in_book(self):
-        """Every move is in the book → is_fully_booked = True."""
-        book = {
-            _starting_fen(): [chess.Move.from_uci("e2e4")],
-            _fen_after_moves("e2e4"): [chess.Move.from_uci("e7e5")],
-        }
-        fake = FakeReader(book_moves_by_fen=book)
-
-        detector = OpeningDetector("dummy_path")
-        moves = [chess.Move.from_uci("e2e4"), chess.Move.from_uci("e7e5")]
-
-        with patch("opening_detector.chess.polyglot.open_reader", return_value=fake):
-            result = detector.find_deviation(moves)
-
-        assert result.is_fully_booked is True
-        assert result.deviation_ply == 2
-        assert result.deviating_side == "none"
-
-    def test_deviation_on_third_ply(self):
-        """Book covers first 2 plies, deviation happens on ply 2 (white's 2nd move)."""
-        book = {
-            _starting_fen(): [chess.Move.from_uci("e2e4")],
-            _fen_after_moves("e2e4"): [chess.Move.from_uci("e7e5")],
-            # No entry for position after 1.e4 e5
-        }
-        fake = FakeReader(book_moves_by_fen=book)
-
-        detector = OpeningDetector("dummy_path")
-        moves = [
-            chess.Move.from_uci("e2e4"),
-            chess.Move.from_uci("e7e5"),
-            chess.Move.from_uci("g1f3"),
-        ]
+class TestFindDeviation:
+    @pytest.mark.parametrize(
+        "book,moves,ply,side,booked,played,book_out",
+        [
+            pytest.param(
+                {}, ["e2e4"],
+                0, "white", False, "e2e4", [],
+                id="first_move_not_in_book",
+            ),
+            pytest.param(
+                # No book entry for the position after 1.e4
+                {_START_FEN: ["e2e4"]}, ["e2e4", "c7c5"],
+                1, "black", False, "c7c5", [],
+                id="deviation_on_blacks_move",
+            ),
+            pytest.param(
+                {_START_FEN: ["e2e4"], _FEN_AFTER_E4: ["e7e5"]},
+                ["e2e4", "e7e5"],
+                2, "none", True, None, [],
+                id="all_moves_in_book",
+            ),
+            pytest.param(
+                # No entry for position after 1.e4 e5
+                {_START_FEN: ["e2e4"], _FEN_AFTER_E4: ["e7e5"]},
+                ["e2e4", "e7e5", "g1f3"],
+                2, "white", False, "g1f3", [],
+                id="deviation_on_third_ply",
+            ),
+            pytest.param(
+                # Black plays d7d5 (not in book)
+                {_START_FEN: ["e2e4"], _FEN_AFTER_E4: ["e7e5", "c7c5"]},
+                ["e2e4", "d7d5"],
+                1, "black", False, "d7d5", ["e7e5", "c7c5"],
+                id="book_moves_captured_on_deviation",
+            ),
+            pytest.param(
+                # Player plays d4, which is in the book
+                {_START_FEN: ["e2e4", "d2d4", "c2c4"]}, ["d2d4"],
+                1, "none", True, None, [],
+                id="multiple_book_moves_available",
+            ),
+        ],
+    )
+    def test_find_deviation(self, write_book, book, moves, ply, side,
+                            booked, played, book_out):
+        detector = OpeningDetector(write_book({
+            fen: _uci(*book_moves) for fen, book_moves in book.items()
+        }))
+
+        result = detector.find_deviation(_uci(*moves))
 
-        with patch("opening_detector.chess.polyglot.open_reader", return_value=fake):
-            result = detector.find_deviation(moves)
+        assert result is not None
+        assert result.deviation_ply == ply
+        assert result.deviating_side == side
+        assert result.is_fully_booked is booked
+        assert result.played_move == (chess.Move.from_uci(played) if played else None)
+        assert sorted(m.uci() for m in result.book_moves) == sorted(book_out)
 
-        assert result.deviation_ply == 2
-        assert result.deviating_side == "white"
-        assert result.is_fully_booked is False
+    def test_empty_moves_returns_none(self):
+        assert _DETECTOR.find_deviation([]) is None
 
-    def test_board_at_deviation_is_correct(self):
+    def test_board_at_deviation_is_correct(self, write_book):
         """The board_at_deviation should be the position BEFORE the deviating move."""
         book = {
-            _starting_fen(): [chess.Move.from_uci("e2e4")],
+            _START_FEN: [chess.Move.from_uci("e2e4")],
         }
-        fake = FakeReader(book_moves_by_fen=book)
+        detector = OpeningDetector(write_book(book))
 
-        detector = OpeningDetector("dummy_path")
         moves = [chess.Move.from_uci("e2e4"), chess.Move.from_uci("c7c5")]
 
-        with patch("opening_detector.chess.polyglot.open_reader", return_value=fake):
-            result = detector.find_deviation(moves)
+        result = detector.find_deviation(moves)
 
         # Board should be the position after 1.e4 (before black's deviation)
         expected = chess.Board()
         expected.push(chess.Move.from_uci("e2e4"))
-        assert result.board_at_deviation.fen() == expected.fen()
-
-    def test_played_move_captured_on_deviation(self):
-        """played_move should be the move that deviated from the book."""
-        book = {
-            _starting_fen(): [chess.Move.from_uci("e2e4")],
-        }
-        fake = FakeReader(book_moves_by_fen=book)
-
-        detector = OpeningDetector("dummy_path")
-        moves = [chess.Move.from_uci("e2e4"), chess.Move.from_uci("c7c5")]
-
-        with patch("opening_detector.chess.polyglot.open_reader", return_value=fake):
-            result = detector.find_deviation(moves)
-
-        assert result.played_move == chess.Move.from_uci("c7c5")
-
-    def test_book_moves_captured_on_deviation(self):
-        """book_moves should list what the book offered at the deviation point."""
-        book = {
-            _starting_fen(): [chess.Move.from_uci("e2e4")],
-            _fen_after_moves("e2e4"): [
-                chess.Move.from_uci("e7e5"),
-                chess.Move.from_uci("c7c5"),
-            ],
-        }
-        fake = FakeReader(book_moves_by_fen=book)
-
-        detector = OpeningDetector("dummy_path")
-        # Black plays d7d5 (not in book)
-        moves = [chess.Move.from_uci("e2e4"), chess.Move.from_uci("d7d5")]
+        assert result.board_at_deviation == expected
 
-        with patch("opening_detector.chess.polyglot.open_reader", return_value=fake):
-            result = detector.find_deviation(moves)
-
-        assert result.played_move == chess.Move.from_uci("d7d5")
-        assert set(result.book_moves) == {
-            chess.Move.from_uci("e7e5"),
-            chess.Move.from_uci("c7c5"),
-        }
-
-    def test_fully_booked_has_no_played_move(self):
-        """When all moves are in book, played_move should be None."""
+    def test_fully_booked_board_is_position_before_last_move(self, write_book):
+        """A fully booked game reports the position before its final book move."""
         book = {
-            _starting_fen(): [chess.Move.from_uci("e2e4")],
-            _fen_after_moves("e2e4"): [chess.Move.from_uci("e7e5")],
+            _START_FEN: [chess.Move.from_uci("e2e4")],
+            _FEN_AFTER_E4: [chess.Move.from_uci("e7e5")],
         }
-        fake = FakeReader(book_moves_by_fen=book)
+        detector = OpeningDetector(write_book(book))
 
-        detector = OpeningDetector("dummy_path")
-        moves = [chess.Move.from_uci("e2e4"), chess.Move.from_uci("e7e5")]
-
-        with patch("opening_detector.chess.polyglot.open_reader", return_value=fake):
-            result = detector.find_deviation(moves)
+        result = detector.find_deviation(_uci("e2e4", "e7e5"))
 
         assert result.is_fully_booked is True
-        assert result.played_move is None
-        assert result.book_moves == []
-
-    def test_first_move_deviation_captures_empty_book(self):
-        """When book is empty, deviation at ply 0 should capture empty book_moves."""
-        fake = FakeReader(book_moves_by_fen={})
+        assert result.board_at_deviation == chess.Board(_FEN_AFTER_E4)
 
-        detector = OpeningDetector("dummy_path")
-        moves = [chess.Move.from_uci("e2e4")]
 
-        with patch("opening_detector.chess.polyglot.open_reader", return_value=fake):
-            result = detector.find_deviation(moves)
+class TestCorruptBook:
+    """The polyglot reader drops illegal entries itself, so corrupt books
+    are simulated with FakeReader behind a patched open_reader."""
 
-        assert result.played_move == chess.Move.from_uci("e2e4")
-        assert result.book_moves == []
+    @pytest.fixture(autouse=True)
+    def _patch_open_reader(self, monkeypatch):
+        """Route open_reader to whichever FakeReader the test installed."""
+        monkeypatch.setattr(
+            "opening_detector.chess.polyglot.open_reader", lambda path: _current_fake
+        )
+        yield
+        _set_fake(None)
 
     def test_illegal_move_in_book_line_returns_none(self):
         """Games with corrupt move sequences return None instead of crashing."""
         # Book claims e5f6 is a valid book move for the starting position,
         # but it's actually illegal — the guard should catch this and return None.
         book = {
-            _starting_fen(): [chess.Move.from_uci("e5f6")],
+            _START_FEN: [chess.Move.from_uci("e5f6")],
         }
         fake = FakeReader(book_moves_by_fen=book)
 
-        detector = OpeningDetector("dummy_path")
         moves = [chess.Move.from_uci("e5f6")]
 
-        with patch("opening_detector.chess.polyglot.open_reader", return_value=fake):
-            result = detector.find_deviation(moves)
+        _set_fake(fake)
+        result = _DETECTOR.find_deviation(moves)
 
         assert result is None
 
     def test_illegal_move_in_book_line_logs_warning(self, caplog):
         """A warning is logged for corrupt move sequences."""
         book = {
-            _starting_fen(): [chess.Move.from_uci("e5f6")],
+            _START_FEN: [chess.Move.from_uci("e5f6")],
         }
         fake = FakeReader(book_moves_by_fen=book)
 
-        detector = OpeningDetector("dummy_path")
         moves = [chess.Move.from_uci("e5f6")]
 
+        _set_fake(fake)
         with caplog.at_level("WARNING"):
-            with patch("opening_detector.chess.polyglot.open_reader", return_value=fake):
-                detector.find_deviation(moves)
+            _DETECTOR.find_deviation(moves)
 
         assert "e5f6" in caplog.text
-
-    def test_multiple_book_moves_available(self):
-        """Book has multiple candidate moves; game plays one of them → no deviation."""
-        book = {
-            _starting_fen(): [
-                chess.Move.from_uci("e2e4"),
-                chess.Move.from_uci("d2d4"),
-                chess.Move.from_uci("c2c4"),
-            ],
-        }
-        fake = FakeReader(book_moves_by_fen=book)
-
-        detector = OpeningDetector("dummy_path")
-        # Player plays d4, which is in the book
-        moves = [chess.Move.from_uci("d2d4")]
-
-        with patch("opening_detector.chess.polyglot.open_reader", return_value=fake):
-            result = detector.find_deviation(moves)
-
-        # d4 is in book, so all moves are booked
-        assert result.is_fully_booked is True
@@ -1,4 +1,5 @@
 import chess
+import pytest
 from unittest.mock import patch
 
 from pgn_parser import PGNParser
@@ -24,16 +25,21 @@ HEADER_ONLY_PGN = """[Event "Live Chess"]
 *"""
 
 
+@pytest.fixture(scope="module")
+def sample_moves():
+    """SAMPLE_PGN parsed once and shared by the behavioural checks."""
+    return PGNParser.parse_moves(SAMPLE_PGN)
+
+
 class TestParseMoves:
     def test_valid_pgn_returns_moves(self):
         moves = PGNParser.parse_moves(SAMPLE_PGN)
         assert moves is not None
         assert len(moves) == 10  # 5 full moves = 10 half-moves
-        assert all(isinstance(m, chess.Move) for m in moves)
+        assert not any(type(m) is not chess.Move for m in moves)
 
-    def test_first_move_is_e4(self):
-        moves = PGNParser.parse_moves(SAMPLE_PGN)
-        assert moves[0] == chess.Move.from_uci("e2e4")
+    def test_first_move_is_e4(self, sample_moves):
+        assert sample_moves[0] == chess.Move.from_uci("e2e4")
 
     def test_short_pgn(self):
         moves = PGNParser.parse_moves(SHORT_PGN)
@@ -81,6 +87,16 @@ class TestParseMoves:
         result = PGNParser.parse_moves(pgn)
         assert result is not None
 
+    def test_variations_and_comments_ignored(self):
+        pgn = '[Event "Test"]\n\n1. e4 {best by test} e5 (1... c5 2. Nf3) 2. Nf3 $1 Nc6 1-0'
+        moves = PGNParser.parse_moves(pgn)
+        assert [m.uci() for m in moves] == ["e2e4", "e7e5", "g1f3", "b8c6"]
+
+    def test_illegal_move_keeps_moves_before_it(self):
+        pgn = '[Event "Test"]\n\n1. e4 e5 2. Ke3 Nc6 1-0'
+        moves = PGNParser.parse_moves(pgn)
+        assert [m.uci() for m in moves] == ["e2e4", "e7e5"]
+
 
 CLOCKS_PGN = """[Event "Live Chess"]
 [Result "1-0"]
@@ -131,14 +147,16 @@ class TestReplayToPosition:
         # After 1. e4, it's black's turn
         assert board.turn == chess.BLACK
         # e4 pawn should be on e4
-        assert board.piece_at(chess.E4) == chess.Piece(chess.PAWN, chess.WHITE)
+        assert board.piece_type_at(chess.E4) == chess.PAWN
+        assert board.color_at(chess.E4) == chess.WHITE
 
     def test_replay_to_second_move(self):
         board = PGNParser.replay_to_position(SAMPLE_PGN, 1)
         assert board is not None
         # After 1. e4 c5, it's white's turn
         assert board.turn == chess.WHITE
-        assert board.piece_at(chess.C5) == chess.Piece(chess.PAWN, chess.BLACK)
+        assert board.piece_type_at(chess.C5) == chess.PAWN
+        assert board.color_at(chess.C5) == chess.BLACK
 
     def test_replay_to_last_move(self):
         board = PGNParser.replay_to_position(SAMPLE_PGN, 9)
@@ -1,3 +1,5 @@
+import threading
+
 import chess
 from unittest.mock import MagicMock, patch
 
@@ -35,6 +37,9 @@ def _mock_deviation(ply=6, side="black", fully_booked=False,
     )
 
 
+_FEN_AFTER_E4 = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1"
+
+
 def _mock_eval(cp=25, best_move=None):
     return EvalResult(score_cp=cp, score_mate=None, depth=18, best_move=best_move)
 
@@ -363,6 +368,66 @@ class TestAnalyzeParallel:
         # Should be called once per game (4 times), not once per worker (2 times)
         assert callback.call_count == 4
 
+    def test_parallel_progress_reported_on_calling_thread(self):
+        """Workers hand results back; the caller's thread runs the callback."""
+        games = [_make_game_with_pgn() for _ in range(4)]
+
+        mock_detector = MagicMock()
+        mock_detector.find_deviation.return_value = _mock_deviation()
+
+        mock_evaluator = MagicMock()
+        mock_evaluator.stockfish_path = "fake_path"
+        mock_evaluator.depth = 18
+
+        callback_threads = []
+        calls = []
+
+        def callback(current, total):
+            callback_threads.append(threading.get_ident())
+            calls.append((current, total))
+
+        with patch("repertoire_analyzer.StockfishEvaluator") as MockSFClass:
+            mock_engine = MagicMock()
+            mock_engine.evaluate.return_value = _mock_eval(cp=0)
+            MockSFClass.return_value = mock_engine
+
+            analyzer = RepertoireAnalyzer("player", mock_detector, mock_evaluator)
+            analyzer.analyze_repertoire(games, progress_callback=callback, workers=2)
+
+        assert set(callback_threads) == {threading.get_ident()}
+        assert calls == [(1, 4), (2, 4), (3, 4), (4, 4)]
+
+    def test_parallel_engine_error_still_reports_progress(self):
+        games = [_make_game_with_pgn(), _make_game_with_pgn()]
+        games[1].eco_code = "C50"
+
+        mock_detector = MagicMock()
+        mock_detector.find_deviation.side_effect = [
+            _mock_deviation(),
+            DeviationResult(
+                deviation_ply=2, deviating_side="white",
+                board_at_deviation=chess.Board(_FEN_AFTER_E4),
+                is_fully_booked=False,
+            ),
+        ]
+
+        mock_evaluator = MagicMock()
+        mock_evaluator.stockfish_path = "fake_path"
+        mock_evaluator.depth = 18
+
+        with patch("repertoire_analyzer.StockfishEvaluator") as MockSFClass:
+            mock_engine = MagicMock()
+            mock_engine.evaluate.side_effect = [_mock_eval(cp=0), RuntimeError("boom")]
+            MockSFClass.return_value = mock_engine
+
+            callback = MagicMock()
+            analyzer = RepertoireAnalyzer("player", mock_detector, mock_evaluator)
+            _, new_evals = analyzer.analyze_repertoire(
+                games, progress_callback=callback, workers=2)
+
+        assert len(new_evals) == 1
+        assert callback.call_count == 2
+
     def test_parallel_aggregates_stats_correctly(self):
         """Parallel path should produce the same aggregated stats as sequential."""
         games = [
@@ -388,6 +453,65 @@ class TestAnalyzeParallel:
         assert "B90_white" in stats
         assert stats["B90_white"].times_played == 2
 
+    def test_parallel_starts_one_engine_per_worker(self):
+        """Engines are long-lived: one per worker, shared across all its games."""
+        games = [_make_game_with_pgn() for _ in range(5)]
+
+        mock_detector = MagicMock()
+        mock_detector.find_deviation.side_effect = [
+            _mock_deviation(), _mock_deviation(), _mock_deviation(),
+            DeviationResult(
+                deviation_ply=2, deviating_side="white",
+                board_at_deviation=chess.Board(_FEN_AFTER_E4),
+                is_fully_booked=False,
+            ),
+            DeviationResult(
+                deviation_ply=2, deviating_side="white",
+                board_at_deviation=chess.Board(_FEN_AFTER_E4),
+                is_fully_booked=False,
+            ),
+        ]
+
+        mock_evaluator = MagicMock()
+        mock_evaluator.stockfish_path = "fake_path"
+        mock_evaluator.depth = 18
+
+        with patch("repertoire_analyzer.StockfishEvaluator") as MockSFClass:
+            mock_engine = MagicMock()
+            mock_engine.evaluate.return_value = _mock_eval(cp=0)
+            MockSFClass.return_value = mock_engine
+
+            analyzer = RepertoireAnalyzer("player", mock_detector, mock_evaluator)
+            _, new_evals = analyzer.analyze_repertoire(games, workers=2)
+
+        assert MockSFClass.call_count == 2
+        assert len(new_evals) == 5
+        assert mock_engine.__exit__.call_count == 2
+
+    def test_parallel_shared_position_uses_one_engine(self):
+        """Games deviating at the same position form one work unit, so only
+        one engine is started and its position cache evaluates it once."""
+        games = [_make_game_with_pgn() for _ in range(4)]
+
+        mock_detector = MagicMock()
+        mock_detector.find_deviation.return_value = _mock_deviation()
+
+        mock_evaluator = MagicMock()
+        mock_evaluator.stockfish_path = "fake_path"
+        mock_evaluator.depth = 18
+
+        with patch("repertoire_analyzer.StockfishEvaluator") as MockSFClass:
+            mock_engine = MagicMock()
+            mock_engine.evaluate.return_value = _mock_eval(cp=0)
+            MockSFClass.return_value = mock_engine
+
+            analyzer = RepertoireAnalyzer("player", mock_detector, mock_evaluator)
+            _, new_evals = analyzer.analyze_repertoire(games, workers=3)
+
+        assert MockSFClass.call_count == 1
+        assert len(new_evals) == 4
+        assert mock_engine.evaluate.call_count == 4
+
 
 class TestPreprocessEdgeCases:
     """Test _preprocess_game edge cases and progress callback with 0 games."""
@@ -447,6 +571,39 @@ class TestPreprocessEdgeCases:
         assert new_evals == []
 
 
+class TestOpeningEvaluation:
+    def test_eco_strings_are_interned(self):
+        """Evaluations built from separate string objects share one copy."""
+        a = OpeningEvaluation(
+            eco_code="".join(["B", "90"]), eco_name="".join(["Sici", "lian"]),
+            my_color="white", deviation_ply=6, deviating_side="black",
+            eval_cp=0, is_fully_booked=False,
+        )
+        b = OpeningEvaluation(
+            eco_code="".join(["B9", "0"]), eco_name="".join(["Sicil", "ian"]),
+            my_color="white", deviation_ply=6, deviating_side="black",
+            eval_cp=0, is_fully_booked=False,
+        )
+        assert a.eco_code is b.eco_code
+        assert a.eco_name is b.eco_name
+
+    def test_missing_eco_code_left_as_none(self):
+        ev = OpeningEvaluation(
+            eco_code=None, eco_name="Unknown Opening", my_color="white",
+            deviation_ply=0, deviating_side="none", eval_cp=0,
+            is_fully_booked=True,
+        )
+        assert ev.eco_code is None
+
+    def test_uses_slots(self):
+        ev = OpeningEvaluation(
+            eco_code="B90", eco_name="Sicilian", my_color="white",
+            deviation_ply=6, deviating_side="white", eval_cp=0,
+            is_fully_booked=False,
+        )
+        assert not hasattr(ev, "__dict__")
+
+
 class TestOpeningStats:
     def test_avg_eval_zero_times_played(self):
         """avg_eval returns 0.0 when times_played is 0."""
@@ -472,6 +629,10 @@ class TestOpeningStats:
         )
         assert stats.avg_deviation_ply == 5.0
 
+    def test_uses_slots(self):
+        stats = OpeningStats(eco_code="B90", eco_name="Sicilian", color="white")
+        assert not hasattr(stats, "__dict__")
+
 
 
 class TestEvalLoss:
@@ -577,6 +738,42 @@ class TestEvalLoss:
         # Loss = -30 - (-80) = 50 (black lost 50cp)
         assert result.eval_loss_cp == 50
 
+    def test_eval_loss_skips_second_eval_when_best_move_played(self):
+        """Playing the engine's best move costs nothing and needs no second eval."""
+        game = _make_game_with_pgn(my_color="white")
+        played = chess.Move.from_uci("g1f3")
+
+        mock_detector = MagicMock()
+        mock_detector.find_deviation.return_value = _mock_deviation(
+            side="white", played_move=played)
+
+        mock_evaluator = MagicMock()
+        mock_evaluator.evaluate.return_value = _mock_eval(cp=30, best_move=played)
+
+        analyzer = RepertoireAnalyzer("player", mock_detector, mock_evaluator)
+        result = analyzer.analyze_game(game)
+
+        assert result.eval_loss_cp == 0
+        assert mock_evaluator.evaluate.call_count == 1
+
+    def test_repertoire_skips_second_eval_when_best_move_played(self):
+        """The repertoire path applies the same best-move shortcut per game."""
+        games = [_make_game_with_pgn(my_color="white") for _ in range(2)]
+        played = chess.Move.from_uci("g1f3")
+
+        mock_detector = MagicMock()
+        mock_detector.find_deviation.return_value = _mock_deviation(
+            side="white", played_move=played)
+
+        mock_evaluator = MagicMock()
+        mock_evaluator.evaluate.return_value = _mock_eval(cp=30, best_move=played)
+
+        analyzer = RepertoireAnalyzer("player", mock_detector, mock_evaluator)
+        _, new_evals = analyzer.analyze_repertoire(games)
+
+        assert [ev.eval_loss_cp for _, ev in new_evals] == [0, 0]
+        assert mock_evaluator.evaluate.call_count == 2
+
 
 class TestMyResult:
     """Tests for my_result being populated from game outcome."""
@@ -1,140 +1,142 @@
 import chess
 import chess.engine
-from unittest.mock import patch, MagicMock
+from types import MappingProxyType
+from unittest.mock import MagicMock
 
 import pytest
 
 from stockfish_evaluator import StockfishEvaluator, EvalResult, MATE_SCORE_CP
 
+# evaluate() never mutates the board it is given, so tests share these
+_E2E4 = chess.Move.from_uci("e2e4")
+_STARTPOS = chess.Board()
+_AFTER_E4 = chess.Board("rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1")
+_INVALID = chess.Board("rnbq1bnK/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR b - - 0 1")
 
-def _make_score(cp=None, mate=None):
-    """Create a mock chess.engine score from white's perspective."""
-    score = MagicMock()
-    white_pov = MagicMock()
-
-    if mate is not None:
-        white_pov.is_mate.return_value = True
-        white_pov.mate.return_value = mate
-        white_pov.score.return_value = None
-    else:
-        white_pov.is_mate.return_value = False
-        white_pov.mate.return_value = None
-        white_pov.score.return_value = cp
-
-    score.white.return_value = white_pov
-    return score
-
-
-class TestEvalResult:
-    def test_score_for_white(self):
-        result = EvalResult(score_cp=50, score_mate=None, depth=18, best_move=None)
-        assert result.score_for_color("white") == 50
 
-    def test_score_for_black(self):
-        result = EvalResult(score_cp=50, score_mate=None, depth=18, best_move=None)
-        assert result.score_for_color("black") == -50
+class _WhitePov:
+    """Score from white's perspective, with the chess.engine methods evaluate() uses."""
+    __slots__ = ("_cp", "_mate")
 
-    def test_negative_score_for_white(self):
-        result = EvalResult(score_cp=-120, score_mate=None, depth=18, best_move=None)
-        assert result.score_for_color("white") == -120
+    def __init__(self, cp, mate):
+        self._cp = cp
+        self._mate = mate
 
-    def test_negative_score_for_black(self):
-        result = EvalResult(score_cp=-120, score_mate=None, depth=18, best_move=None)
-        assert result.score_for_color("black") == 120
+    def is_mate(self):
+        return self._mate is not None
 
-    def test_zero_score(self):
-        result = EvalResult(score_cp=0, score_mate=None, depth=18, best_move=None)
-        assert result.score_for_color("white") == 0
-        assert result.score_for_color("black") == 0
+    def mate(self):
+        return self._mate
 
-    def test_mate_score_for_color(self):
-        result = EvalResult(score_cp=MATE_SCORE_CP, score_mate=3, depth=18, best_move=None)
-        assert result.score_for_color("white") == MATE_SCORE_CP
-        assert result.score_for_color("black") == -MATE_SCORE_CP
+    def score(self):
+        return None if self._mate is not None else self._cp
 
 
-class TestStockfishEvaluator:
-    def test_evaluate_returns_centipawn_score(self):
-        mock_engine = MagicMock()
-        mock_engine.analyse.return_value = {
-            "score": _make_score(cp=35),
-            "depth": 18,
-            "pv": [chess.Move.from_uci("e2e4")],
-        }
+class _Score:
+    __slots__ = ("_white",)
 
-        evaluator = StockfishEvaluator("dummy_path", depth=18)
-        evaluator._engine = mock_engine
+    def __init__(self, white):
+        self._white = white
 
-        board = chess.Board()
-        result = evaluator.evaluate(board)
+    def white(self):
+        return self._white
 
-        assert result.score_cp == 35
-        assert result.score_mate is None
-        assert result.depth == 18
-        assert result.best_move == chess.Move.from_uci("e2e4")
 
-    def test_evaluate_mate_score(self):
-        mock_engine = MagicMock()
-        mock_engine.analyse.return_value = {
-            "score": _make_score(mate=3),
-            "depth": 18,
-            "pv": [chess.Move.from_uci("e2e4")],
-        }
+def _make_score(cp=None, mate=None):
+    """Create a stub chess.engine score from white's perspective."""
+    return _Score(_WhitePov(cp, mate))
 
-        evaluator = StockfishEvaluator("dummy_path", depth=18)
-        evaluator._engine = mock_engine
 
-        result = evaluator.evaluate(chess.Board())
-        assert result.score_cp == MATE_SCORE_CP
-        assert result.score_mate == 3
+# Canned engine.analyse() results, shared by every test that uses them.
+# Read-only so a change to evaluate() that mutated them would fail loudly
+# instead of leaking into later tests.
+_RESULT_CP35 = MappingProxyType(
+    {"score": _make_score(cp=35), "depth": 18, "pv": (_E2E4,)})
+_RESULT_MATE3 = MappingProxyType(
+    {"score": _make_score(mate=3), "depth": 18, "pv": (_E2E4,)})
+_RESULT_MATE_NEG2 = MappingProxyType(
+    {"score": _make_score(mate=-2), "depth": 18, "pv": ()})
+_RESULT_NO_PV = MappingProxyType({"score": _make_score(cp=0), "depth": 18})
 
-    def test_evaluate_negative_mate(self):
-        mock_engine = MagicMock()
-        mock_engine.analyse.return_value = {
-            "score": _make_score(mate=-2),
-            "depth": 18,
-            "pv": [],
-        }
 
-        evaluator = StockfishEvaluator("dummy_path", depth=18)
-        evaluator._engine = mock_engine
+class TestEvalResult:
+    @pytest.mark.parametrize("score_cp,score_mate,color,expected", [
+        (50, None, "white", 50),
+        (50, None, "black", -50),
+        (-120, None, "white", -120),
+        (-120, None, "black", 120),
+        (0, None, "white", 0),
+        (0, None, "black", 0),
+        (MATE_SCORE_CP, 3, "white", MATE_SCORE_CP),
+        (MATE_SCORE_CP, 3, "black", -MATE_SCORE_CP),
+    ])
+    def test_score_for_color(self, score_cp, score_mate, color, expected):
+        result = EvalResult(score_cp=score_cp, score_mate=score_mate,
+                            depth=18, best_move=None)
+        assert result.score_for_color(color) == expected
+
+
+@pytest.fixture(scope="module")
+def _engine_pool():
+    return MagicMock()
+
+
+@pytest.fixture
+def mock_engine(_engine_pool):
+    """One engine mock for the module, wiped of calls and canned results per test."""
+    # return_value=True on the engine itself would also reset magic methods
+    # such as __bool__, so only analyse's return value is cleared
+    _engine_pool.reset_mock(side_effect=True)
+    _engine_pool.analyse.reset_mock(return_value=True)
+    return _engine_pool
+
+
+@pytest.fixture
+def evaluator(mock_engine):
+    """A depth-18 evaluator already running on mock_engine.
+
+    Function-scoped: each evaluator carries its own position cache, which
+    must not leak results between tests.
+    """
+    evaluator = StockfishEvaluator("dummy_path", depth=18)
+    evaluator._engine = mock_engine
+    return evaluator
 
-        result = evaluator.evaluate(chess.Board())
-        assert result.score_cp == -MATE_SCORE_CP
-        assert result.score_mate == -2
 
-    def test_evaluate_no_pv(self):
-        mock_engine = MagicMock()
-        mock_engine.analyse.return_value = {
-            "score": _make_score(cp=0),
-            "depth": 18,
-        }
-
-        evaluator = StockfishEvaluator("dummy_path", depth=18)
-        evaluator._engine = mock_engine
-
-        result = evaluator.evaluate(chess.Board())
-        assert result.best_move is None
+class TestStockfishEvaluator:
+    @pytest.mark.parametrize("analyse_result,score_cp,score_mate,best_move", [
+        pytest.param(_RESULT_CP35, 35, None, _E2E4, id="centipawns"),
+        pytest.param(_RESULT_MATE3, MATE_SCORE_CP, 3, _E2E4, id="mate"),
+        pytest.param(_RESULT_MATE_NEG2, -MATE_SCORE_CP, -2, None, id="negative-mate"),
+        pytest.param(_RESULT_NO_PV, 0, None, None, id="no-pv"),
+    ])
+    def test_evaluate(self, evaluator, mock_engine, analyse_result, score_cp,
+                      score_mate, best_move):
+        mock_engine.analyse.return_value = analyse_result
+
+        result = evaluator.evaluate(_STARTPOS)
+        assert result.score_cp == score_cp
+        assert result.score_mate == score_mate
+        assert result.depth == 18
+        assert result.best_move == best_move
 
     def test_evaluate_without_context_manager_raises(self):
         evaluator = StockfishEvaluator("dummy_path")
         with pytest.raises(RuntimeError, match="Engine not started"):
-            evaluator.evaluate(chess.Board())
+            evaluator.evaluate(_STARTPOS)
 
-    @patch("stockfish_evaluator.chess.engine.SimpleEngine.popen_uci")
-    def test_context_manager_starts_and_stops_engine(self, mock_popen):
-        mock_engine = MagicMock()
-        mock_popen.return_value = mock_engine
+    def test_context_manager_starts_and_stops_engine(self, monkeypatch, mock_engine):
+        monkeypatch.setattr(chess.engine.SimpleEngine, "popen_uci",
+                            lambda path: mock_engine)
 
         with StockfishEvaluator("dummy_path") as evaluator:
             assert evaluator._engine is mock_engine
 
         mock_engine.quit.assert_called_once()
 
-    @patch("stockfish_evaluator.chess.engine.SimpleEngine.popen_uci")
-    def test_context_manager_cleans_up_on_exception(self, mock_popen):
-        mock_engine = MagicMock()
-        mock_popen.return_value = mock_engine
+    def test_context_manager_cleans_up_on_exception(self, monkeypatch, mock_engine):
+        monkeypatch.setattr(chess.engine.SimpleEngine, "popen_uci",
+                            lambda path: mock_engine)
 
         with pytest.raises(ValueError):
             with StockfishEvaluator("dummy_path") as evaluator:
@@ -142,50 +144,79 @@ class TestStockfishEvaluator:
 
         mock_engine.quit.assert_called_once()
 
-    def test_evaluate_invalid_board_returns_none(self):
+    def test_evaluate_invalid_board_returns_none(self, evaluator, mock_engine):
         """Invalid positions (e.g. from custom FEN games) should be skipped."""
-        evaluator = StockfishEvaluator("dummy_path", depth=14)
-        evaluator._engine = MagicMock()
-
         # Board with white king on h8 and no black king — invalid
-        board = chess.Board("rnbq1bnK/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR b - - 0 1")
-        result = evaluator.evaluate(board)
+        result = evaluator.evaluate(_INVALID)
         assert result is None
-        evaluator._engine.analyse.assert_not_called()
+        mock_engine.analyse.assert_not_called()
 
-    def test_evaluate_illegal_best_move_returns_none(self):
+    def test_evaluate_illegal_best_move_returns_none(self, evaluator, mock_engine):
         """If engine returns a move illegal for the position, discard result."""
-        mock_engine = MagicMock()
         # Return e2e4 (a white move) for a position where it's black to move
         mock_engine.analyse.return_value = {
             "score": _make_score(cp=30),
             "depth": 14,
-            "pv": [chess.Move.from_uci("e2e4")],
+            "pv": [_E2E4],
         }
 
-        evaluator = StockfishEvaluator("dummy_path", depth=14)
-        evaluator._engine = mock_engine
-
         # Standard position after 1. e4 — it's black's turn
-        board = chess.Board()
-        board.push(chess.Move.from_uci("e2e4"))
-        result = evaluator.evaluate(board)
+        result = evaluator.evaluate(_AFTER_E4)
         # e2e4 is not legal for black, so result should be None
         assert result is None
 
-    @patch("stockfish_evaluator.chess.engine.SimpleEngine.popen_uci")
-    def test_engine_restart_on_error(self, mock_popen):
+    def test_engine_restart_on_error(self, monkeypatch, evaluator, mock_engine):
         """Engine should be restarted after an EngineError."""
-        mock_engine = MagicMock()
         mock_engine.analyse.side_effect = chess.engine.EngineError("broken")
         mock_new_engine = MagicMock()
-        mock_popen.return_value = mock_new_engine
+        mock_popen = MagicMock(return_value=mock_new_engine)
+        monkeypatch.setattr(chess.engine.SimpleEngine, "popen_uci", mock_popen)
 
-        evaluator = StockfishEvaluator("dummy_path", depth=14)
-        evaluator._engine = mock_engine
-
-        result = evaluator.evaluate(chess.Board())
+        result = evaluator.evaluate(_STARTPOS)
         assert result is None
         mock_engine.quit.assert_called_once()
         mock_popen.assert_called_once_with("dummy_path")
         assert evaluator._engine is mock_new_engine
+
+    def test_repeated_position_served_from_cache(self, evaluator, mock_engine):
+        """The same position (ignoring move counters) is only analysed once."""
+        mock_engine.analyse.return_value = {"score": _make_score(cp=12), "depth": 18}
+
+        first = evaluator.evaluate(_STARTPOS)
+        later_counters = chess.Board("rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 4 9")
+        second = evaluator.evaluate(later_counters)
+
+        assert second is first
+        assert mock_engine.analyse.call_count == 1
+
+    def test_engine_errors_are_not_cached(self, evaluator, mock_engine):
+        mock_engine.analyse.side_effect = [
+            chess.engine.EngineError("broken"),
+            {"score": _make_score(cp=7), "depth": 18},
+        ]
+        evaluator._try_restart_engine = MagicMock()
+
+        assert evaluator.evaluate(_STARTPOS) is None
+        assert evaluator.evaluate(_STARTPOS).score_cp == 7
+
+    def test_cache_evicts_least_recently_used(self, mock_engine):
+        mock_engine.analyse.return_value = _RESULT_NO_PV
+
+        evaluator = StockfishEvaluator("dummy_path", depth=18, cache_size=1)
+        evaluator._engine = mock_engine
+
+        evaluator.evaluate(_STARTPOS)
+        evaluator.evaluate(_AFTER_E4)
+        evaluator.evaluate(_STARTPOS)
+
+        assert mock_engine.analyse.call_count == 3
+
+    def test_evaluate_searches_to_configured_depth(self, mock_engine):
+        mock_engine.analyse.return_value = {"score": _make_score(cp=0), "depth": 12}
+
+        evaluator = StockfishEvaluator("dummy_path", depth=12)
+        evaluator._engine = mock_engine
+        evaluator.evaluate(_STARTPOS)
+
+        _, limit = mock_engine.analyse.call_args[0]
+        assert limit == chess.engine.Limit(depth=12)
@@ -1,10 +1,14 @@
 """Tests for web/reports.py — helper functions and DB-backed report routes."""
 
+import json
 import sys
+import xml.etree.ElementTree as ET
 from collections import namedtuple
 from datetime import datetime, timezone
 from unittest.mock import patch, MagicMock
 
+import chess
+import chess.svg
 import pytest
 
 # Mock the db module before importing anything that touches it.
@@ -26,6 +30,10 @@ from web.reports import (  # noqa: E402
     load_openings_data,
     load_endgames_data,
     _aggregate_endgames,
+    _board_for,
+    _board_frame,
+    _endgame_deep_link,
+    _platform_of,
 )
 from web.app import create_app  # noqa: E402
 
@@ -95,6 +103,12 @@ class TestGroupDeviations:
         devs, counts, _ = group_deviations([ev1, ev2])
         assert len(devs) == 2
 
+    def test_equal_loss_keeps_first_seen(self):
+        ev1 = _make_eval(eval_loss_cp=150, game_url='https://chess.com/game/1')
+        ev2 = _make_eval(eval_loss_cp=150, game_url='https://chess.com/game/2')
+        devs, _, _ = group_deviations(iter([ev1, ev2]))
+        assert devs == [ev1]
+
 
 class TestMoveToSan:
     def test_valid_move(self):
@@ -108,6 +122,26 @@ class TestMoveToSan:
         fen = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1'
         assert move_to_san(fen, 'z9z9') == 'z9z9'
 
+    def test_repeated_conversion_is_cached(self):
+        fen = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1'
+        move_to_san(fen, 'c7c5')
+        hits = move_to_san.cache_info().hits
+        assert move_to_san(fen, 'c7c5') == 'c5'
+        assert move_to_san.cache_info().hits == hits + 1
+
+
+class TestBoardFor:
+    def test_same_fen_shares_board(self):
+        fen = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1'
+        assert _board_for(fen) is _board_for(fen)
+
+    def test_san_conversion_leaves_shared_board_untouched(self):
+        fen = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1'
+        move_to_san(fen, 'g7g6')
+        prepare_deviation(_make_eval(book_moves_uci=['e7e5', 'g8f6']), {}, {})
+        assert _board_for(fen).fen() == fen
+        assert not _board_for(fen).move_stack
+
 
 class TestFormatClock:
     def test_none(self):
@@ -133,6 +167,13 @@ class TestPlyToMoveLabel:
     def test_white_move_ten(self):
         assert ply_to_move_label(18, 'white') == '10.'
 
+    def test_even_ply_for_black_uses_white_label(self):
+        assert ply_to_move_label(4, 'black') == '3.'
+
+    def test_beyond_label_table(self):
+        assert ply_to_move_label(201, 'black') == '101...'
+        assert ply_to_move_label(200, 'white') == '101.'
+
 
 class TestFormatDate:
     def test_none(self):
@@ -143,6 +184,25 @@ class TestFormatDate:
         assert format_date(dt) == 'September 5, 2025'
 
 
+class TestPlatformOf:
+    @pytest.mark.parametrize('url,platform', [
+        ('https://www.chess.com/game/live/123', 'chesscom'),
+        ('https://chess.com/game/123', 'chesscom'),
+        ('https://lichess.org/abcd1234', 'lichess'),
+        ('https://example.com/chess.com/1', 'unknown'),
+        ('', 'unknown'),
+        (None, 'unknown'),
+    ])
+    def test_classifies_url(self, url, platform):
+        assert _platform_of(url) == platform
+
+    def test_deep_links(self):
+        assert _endgame_deep_link('https://lichess.org/abc', 40) == (
+            'https://lichess.org/abc#41')
+        assert _endgame_deep_link('https://www.chess.com/game/live/1', 40) == (
+            'https://www.chess.com/analysis/game/live/1?tab=analysis&move=40')
+
+
 class TestPrepareDeviation:
     def test_returns_expected_keys(self):
         ev = _make_eval()
@@ -151,14 +211,44 @@ class TestPrepareDeviation:
             'win': 1, 'loss': 1, 'draw': 1
         }}
         item = prepare_deviation(ev, counts, results)
-        assert item['eco_code'] == 'B90'
-        assert item['times_played'] == 3
-        assert item['win_pct'] == 33
-        assert item['loss_pct'] == 33
-        assert item['platform'] == 'chesscom'
-        assert 'fen' in item
-        assert 'best_san' in item
-        assert 'played_san' in item
+        assert item.eco_code == 'B90'
+        assert item.times_played == 3
+        assert item.win_pct == 33
+        assert item.loss_pct == 33
+        assert item.platform == 'chesscom'
+        assert item.fen
+        assert item.best_san
+        assert item.played_san
+
+    def test_uses_slots(self):
+        item = prepare_deviation(_make_eval(), {}, {})
+        assert not hasattr(item, '__dict__')
+
+    def test_display_classes(self):
+        ev = _make_eval(eval_loss_cp=-20)
+        key = (ev.fen_at_deviation, ev.played_move_uci)
+        item = prepare_deviation(ev, {key: 2}, {key: {'win': 1, 'loss': 1, 'draw': 0}})
+        assert item.card_class == 'positive'
+        assert item.times_class == 'recurring'
+        assert item.result_class == 'win-high'
+
+    @pytest.mark.parametrize('overrides,detail', [
+        ({}, 'vs opponent1, blitz, June 15, 2025'),
+        ({'opponent_name': ''}, 'blitz, June 15, 2025'),
+        ({'time_class': None, 'end_time': None}, 'vs opponent1'),
+        ({'opponent_name': '', 'time_class': None, 'end_time': None}, ''),
+    ])
+    def test_game_link_detail(self, overrides, detail):
+        item = prepare_deviation(_make_eval(**overrides), {}, {})
+        assert item.game_link_detail == detail
+
+    def test_san_fields(self):
+        ev = _make_eval(best_move_uci=None, book_moves_uci=['e7e5', 'z9z9'])
+        item = prepare_deviation(ev, {}, {})
+        assert item.played_san == 'd5'
+        assert item.best_san == 'N/A'
+        # Unparseable book moves fall back to their UCI string
+        assert item.book_moves == 'e5, z9z9'
 
 
 class TestGetOpeningGroups:
@@ -185,6 +275,46 @@ class TestRenderBoardSvg:
         svg = render_board_svg(fen, '', 'black', '')
         assert '<svg' in svg
 
+    @pytest.mark.parametrize('move,color', [
+        ('e7e5', 'white'), ('g8f6', 'black'), ('', 'white'),
+        ('0000', 'white'), ('0000', 'black'),
+    ])
+    def test_matches_chess_svg_drawing(self, move, color):
+        fen = 'r1bqkbnr/pp1ppppp/2n5/2p5/4P3/5N2/PPPP1PPP/RNBQKB1R b KQkq - 2 3'
+        board = chess.Board(fen)
+        arrows = []
+        if move:
+            m = chess.Move.from_uci(move)
+            arrows = [chess.svg.Arrow(m.from_square, m.to_square, color='#22c55e')]
+        expected = chess.svg.board(
+            board, arrows=arrows, size=350,
+            orientation=chess.WHITE if color == 'white' else chess.BLACK)
+
+        def drawing(svg):
+            return [(el.tag, el.attrib) for el in ET.fromstring(svg).iter()
+                    if not el.tag.endswith(('desc', 'pre'))]
+
+        actual = render_board_svg.__wrapped__(fen, move, color, '#22c55e')
+        assert drawing(actual) == drawing(expected)
+
+    @pytest.mark.parametrize('defs', ['<defs />', '<defs/>', '<defs></defs>', ''])
+    def test_frame_independent_of_defs_serialisation(self, defs):
+        expected = _board_frame(chess.WHITE)
+        svg = chess.svg.board(None, size=350).replace('<defs />', defs)
+        with patch('web.reports.chess.svg.board', return_value=svg):
+            assert _board_frame.__wrapped__(chess.WHITE) == expected
+
+    def test_arrow_color_is_escaped(self):
+        fen = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1'
+        svg = render_board_svg(fen, 'e7e5', 'white', '#f00" onload="alert(1)')
+        assert 'onload="' not in svg
+        assert '#f00&quot; onload=&quot;alert(1)' in svg
+
+    def test_repeated_board_is_memoized(self):
+        fen = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1'
+        first = render_board_svg(fen, 'g8f6', 'black', '#ef4444')
+        assert render_board_svg(fen, 'g8f6', 'black', '#ef4444') is first
+
 
 # ---------------------------------------------------------------------------
 # Data loader tests (mock DB)
@@ -215,6 +345,22 @@ class TestLoadOpeningsData:
         assert data['theory_knowledge_pct'] == 33  # 1 of 3 fully booked/opp
         assert data['username'] == 'testuser'
 
+    @patch('web.reports.dbq')
+    def test_opening_filter_limits_items_not_groups(self, mock_dbq):
+        mock_dbq.get_all_evaluations_for_user.return_value = [
+            _make_eval(eco_code='B90', my_color='white'),
+            _make_eval(eco_code='C50', my_color='black',
+                       deviating_side='black', played_move_uci='e7e6'),
+            _make_eval(eco_code=None, my_color='white',
+                       played_move_uci='c7c6'),
+        ]
+        data = load_openings_data('testuser', None, eco='C50', color='black')
+        assert [i.eco_code for i in data['items']] == ['C50']
+        assert len(data['groups']) == 3
+
+        data = load_openings_data('testuser', None, eco='?', color='white')
+        assert [i.played_move_uci for i in data['items']] == ['c7c6']
+
 
 class TestLoadEndgamesData:
     @patch('web.reports.dbq')
@@ -233,6 +379,33 @@ class TestLoadEndgamesData:
         data = load_endgames_data('testuser', None)
         assert data['eg_total_games'] == 0
 
+    @patch('web.reports.dbq')
+    def test_entries_precompute_render_fields(self, mock_dbq):
+        from fetchers.endgame_detector import EndgameInfo
+        url = 'https://lichess.org/abc'
+        mock_dbq.get_all_evaluations_for_user.return_value = [
+            _make_eval(game_url=url),
+        ]
+        mock_dbq.get_all_endgames_for_user.return_value = {
+            url: {'minor-or-queen': EndgameInfo(
+                endgame_type='R+B vs R', endgame_ply=40,
+                material_balance='up', my_result='win',
+                fen_at_endgame='8/8/8/8/8/8/8/8 w - - 0 1', game_url=url,
+                material_diff=3, my_clock=None, opp_clock=None,
+            )},
+        }
+        entry = load_endgames_data('testuser', None)['stats'][0]
+        assert entry['all_games_query'] == (
+            'def=minor-or-queen&type=R%2BB%20vs%20R&balance=up'
+        )
+        assert json.loads(entry['game_details_json']) == [
+            {'r': 'win', 'tc': 'blitz', 'p': 'lichess', 'c': 'white',
+             'd': '2025-06-15'},
+        ]
+        [candidate] = json.loads(entry['example_candidates_json'])
+        assert (candidate['tc'], candidate['p'], candidate['color']) == (
+            'blitz', 'lichess', 'white')
+
 
 class TestAggregateEndgamesGameMeta:
     """Verify that _aggregate_endgames propagates game metadata."""
@@ -293,14 +466,28 @@ class TestAggregateEndgamesGameMeta:
 # ---------------------------------------------------------------------------
 
 
-@pytest.fixture
-def client():
+@pytest.fixture(scope='module')
+def app():
     app = create_app()
     app.config['TESTING'] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    # Routes are shared across the module; only the rendered pages differ
+    app.extensions['report_cache'].clear()
     with app.test_client() as c:
         yield c
 
 
+class TestTemplatePrecompile:
+    def test_templates_compiled_at_startup(self):
+        app = create_app()
+        cached = {name for _, name in app.jinja_env.cache.keys()}
+        assert set(app.jinja_env.list_templates()) <= cached
+
+
 class TestOpeningsRoute:
     @patch('web.routes.load_endgames_data')
     @patch('web.routes.load_openings_data')
@@ -316,6 +503,7 @@ class TestOpeningsRoute:
                 'eco_name': 'Sicilian Najdorf',
                 'eco_code': 'B90',
                 'color': 'white',
+                'card_class': '',
                 'eval_loss_display': '-1.2',
                 'eval_loss_class': 'bad',
                 'eval_display': '-0.3',
@@ -328,10 +516,13 @@ class TestOpeningsRoute:
                 'best_move_uci': 'e7e5',
                 'played_move_uci': 'd7d5',
                 'times_played': 3,
+                'times_class': 'recurring',
                 'game_url': 'https://chess.com/game/123',
+                'game_link_detail': 'vs opponent1, blitz, June 15, 2025',
                 'eval_loss_raw': 120,
                 'win_pct': 33,
                 'loss_pct': 33,
+                'result_class': 'win-low',
                 'time_class': 'blitz',
                 'platform': 'chesscom',
                 'opponent_name': 'opponent1',
@@ -350,12 +541,13 @@ class TestOpeningsRoute:
 
         resp = client.get('/u/hikaru')
         assert resp.status_code == 200
-        html = resp.data.decode()
-        assert 'Chess Coach' in html
-        assert 'Sicilian Najdorf' in html
-        assert 'B90' in html
-        assert '/u/hikaru/api/render-boards' in html
-        assert '/u/hikaru/endgames' in html
+        assert b'Chess Coach' in resp.data
+        assert b'Sicilian Najdorf' in resp.data
+        assert b'B90' in resp.data
+        assert b'/u/hikaru/api/render-boards' in resp.data
+        assert b'/u/hikaru/endgames' in resp.data
+        assert b'(vs opponent1, blitz, June 15, 2025)' in resp.data
+        assert b'result-badge win-low' in resp.data
 
     @patch('web.routes.load_endgames_data')
     @patch('web.routes.load_openings_data')
@@ -367,17 +559,81 @@ class TestOpeningsRoute:
         assert resp.status_code == 302
 
 
+class TestReportCache:
+    _DATA = {
+        'username': 'hikaru',
+        'chesscom_user': 'hikaru',
+        'lichess_user': None,
+        'items': [],
+        'groups': [],
+        'total_games_analyzed': 0,
+        'avg_eval_loss': 0,
+        'theory_knowledge_pct': 0,
+        'accuracy_pct': 0,
+        'new_games_analyzed': 0,
+    }
+
+    @patch('web.routes.load_endgames_data')
+    @patch('web.routes.load_openings_data')
+    @patch('web.routes.queries')
+    def test_same_job_served_from_cache(self, mock_q, mock_openings,
+                                        mock_endgames, client):
+        mock_q.get_latest_job.return_value = {'id': 1, 'status': 'complete', 'total_games': 1}
+        mock_openings.side_effect = lambda *a, **kw: dict(self._DATA)
+        mock_endgames.return_value = {'endgame_count': 0}
+
+        first = client.get('/u/hikaru')
+        second = client.get('/u/hikaru')
+
+        assert first.status_code == second.status_code == 200
+        assert second.data == first.data
+        assert mock_openings.call_count == 1
+
+    @patch('web.routes.load_endgames_data')
+    @patch('web.routes.load_openings_data')
+    @patch('web.routes.queries')
+    def test_new_job_rerenders(self, mock_q, mock_openings, mock_endgames,
+                               client):
+        mock_q.get_latest_job.return_value = {'id': 1, 'status': 'complete', 'total_games': 1}
+        mock_openings.side_effect = lambda *a, **kw: dict(self._DATA)
+        mock_endgames.return_value = {'endgame_count': 0}
+
+        client.get('/u/hikaru')
+        mock_q.get_latest_job.return_value = {'id': 2, 'status': 'complete', 'total_games': 1}
+        client.get('/u/hikaru')
+
+        assert mock_openings.call_count == 2
+
+    @patch('web.routes.load_endgames_data')
+    @patch('web.routes.load_openings_data')
+    @patch('web.routes.queries')
+    def test_opening_detail_uncached_while_analyzing(self, mock_q, mock_openings,
+                                                     mock_endgames, client):
+        mock_q.get_latest_job.return_value = {'id': 1, 'status': 'analyzing'}
+        mock_openings.side_effect = lambda *a, **kw: dict(self._DATA)
+        mock_endgames.return_value = {'endgame_count': 0}
+
+        client.get('/u/hikaru/opening/B90/white')
+        client.get('/u/hikaru/opening/B90/white')
+
+        assert mock_openings.call_count == 2
+
+
 class TestOpeningDetailRoute:
     @patch('web.routes.load_endgames_data')
     @patch('web.routes.load_openings_data')
-    def test_filters_by_eco_and_color(self, mock_openings, mock_endgames,
-                                      client):
-        mock_openings.return_value = {
+    @patch('web.routes.queries')
+    def test_filters_by_eco_and_color(self, mock_q, mock_openings,
+                                      mock_endgames, client):
+        mock_q.get_latest_job.return_value = {'id': 1, 'status': 'complete', 'total_games': 5}
+        data = {
             'username': 'hikaru',
             'chesscom_user': 'hikaru',
             'lichess_user': None,
             'items': [
                 {'eco_code': 'B90', 'color': 'white', 'eco_name': 'Najdorf',
+                 'card_class': '', 'times_class': '', 'result_class': 'win-high',
+                 'game_link_detail': '',
                  'eval_loss_display': '-1.0', 'eval_loss_class': 'bad',
                  'eval_display': '+0.1', 'eval_class': 'good',
                  'move_label': '6.', 'played_san': 'd5', 'best_san': 'e5',
@@ -387,6 +643,8 @@ class TestOpeningDetailRoute:
                  'loss_pct': 50, 'time_class': 'blitz', 'platform': 'chesscom',
                  'opponent_name': '', 'game_date': '', 'game_date_iso': ''},
                 {'eco_code': 'C50', 'color': 'black', 'eco_name': 'Italian',
+                 'card_class': '', 'times_class': '', 'result_class': 'win-low',
+                 'game_link_detail': '',
                  'eval_loss_display': '-0.5', 'eval_loss_class': 'bad',
                  'eval_display': '-0.1', 'eval_class': 'bad',
                  'move_label': '5...', 'played_san': 'Nf6', 'best_san': 'Bc5',
@@ -403,14 +661,22 @@ class TestOpeningDetailRoute:
             'accuracy_pct': 50,
             'new_games_analyzed': 0,
         }
+
+        def load(chesscom, lichess, eco=None, color=None):
+            items = [i for i in data['items']
+                     if i['eco_code'] == eco and i['color'] == color]
+            return dict(data, items=items)
+
+        mock_openings.side_effect = load
         mock_endgames.return_value = {'endgame_count': 0}
 
         resp = client.get('/u/hikaru/opening/B90/white')
         assert resp.status_code == 200
-        html = resp.data.decode()
-        assert 'Najdorf' in html
+        mock_openings.assert_called_once_with('hikaru', None,
+                                              eco='B90', color='white')
+        assert b'Najdorf' in resp.data
         # C50 item should be filtered out
-        assert 'Italian' not in html
+        assert b'Italian' not in resp.data
 
 
 class TestEndgameRoutes:
@@ -458,9 +724,8 @@ class TestEndgameRoutes:
         resp = client.get('/u/hikaru/endgames/all?def=minor-or-queen'
                           '&type=R+vs+R&balance=equal')
         assert resp.status_code == 200
-        html = resp.data.decode()
-        assert 'R vs R' in html
-        assert '/u/hikaru/endgames' in html
+        assert b'R vs R' in resp.data
+        assert b'/u/hikaru/endgames' in resp.data
 
 
 class TestRenderBoardsAPI:
@@ -487,6 +752,69 @@ class TestRenderBoardsAPI:
         data = resp.get_json()
         assert '<svg' in data[0]
 
+    @pytest.mark.parametrize('arrow_color', [
+        '#f00" onload="alert(1)', 'red', '#12345g', None,
+    ])
+    def test_render_boards_rejects_non_hex_arrow_color(self, client, arrow_color):
+        resp = client.post('/u/hikaru/api/render-boards',
+                           json=[{
+                               'fen': 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1',
+                               'move': 'e7e5',
+                               'color': 'white',
+                               'arrow_color': arrow_color,
+                           }])
+        assert resp.status_code == 200
+        svg = resp.get_json()[0]
+        assert 'onload' not in svg
+        assert 'stroke="#22c55e"' in svg
+
+    def test_render_boards_keeps_hex_arrow_color(self, client):
+        resp = client.post('/u/hikaru/api/render-boards',
+                           json=[{
+                               'fen': 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1',
+                               'move': 'e7e5',
+                               'color': 'white',
+                               'arrow_color': '#ef4444',
+                           }])
+        assert 'stroke="#ef4444"' in resp.get_json()[0]
+
+    def test_render_boards_null_move(self, client):
+        resp = client.post('/u/hikaru/api/render-boards',
+                           json=[{
+                               'fen': 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1',
+                               'move': '0000',
+                               'color': 'white',
+                               'arrow_color': '#22c55e',
+                           }])
+        assert resp.status_code == 200
+        assert 'class="circle"' in resp.get_json()[0]
+
+    def test_boards_reference_page_piece_defs(self, client):
+        resp = client.post('/u/hikaru/api/render-boards',
+                           json=[{
+                               'fen': 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq - 0 1',
+                               'color': 'white',
+                           }])
+        svg = resp.get_json()[0]
+        assert 'href="#white-pawn"' in svg
+        assert 'id="white-pawn"' not in svg
+
+    @patch('web.routes.load_openings_data')
+    @patch('web.routes.load_endgames_data')
+    def test_pages_define_pieces_once(self, mock_endgames, mock_openings,
+                                      client):
+        mock_endgames.return_value = {
+            'username': 'hikaru', 'chesscom_user': 'hikaru',
+            'lichess_user': None, 'stats': [], 'endgame_count': 0,
+            'definitions': [], 'default_definition': 'minor-or-queen',
+            'eg_total_games': 0, 'eg_types_count': 0, 'eg_win_pct': 0,
+        }
+        mock_openings.return_value = {'items': [], 'groups': []}
+
+        resp = client.get('/u/hikaru/endgames')
+        assert resp.data.count(b'id="white-pawn"') == 1
+        assert resp.data.count(b'id="black-king"') == 1
+
 
 class TestSyncButton:
     @patch('web.routes.load_endgames_data')
@@ -511,10 +839,9 @@ class TestSyncButton:
         mock_endgames.return_value = {'endgame_count': 0}
 
         resp = client.get('/u/hikaru')
-        html = resp.data.decode()
-        assert 'action="/analyze"' in html
-        assert 'method="POST"' in html
-        assert 'window.location.reload()' not in html
+        assert b'action="/analyze"' in resp.data
+        assert b'method="POST"' in resp.data
+        assert b'window.location.reload()' not in resp.data
 
 
 class TestUbuntuFont:
@@ -539,6 +866,5 @@ class TestUbuntuFont:
         mock_endgames.return_value = {'endgame_count': 0}
 
         resp = client.get('/u/hikaru')
-        html = resp.data.decode()
-        assert 'fonts.googleapis.com' in html
-        assert 'Ubuntu' in html
+        assert b'fonts.googleapis.com' in resp.data
+        assert b'Ubuntu' in resp.data
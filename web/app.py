@@ -19,5 +19,10 @@ def create_app():
     from web.routes import register_routes
     register_routes(app)
 
+    # Compile every template up front so the first request to each page
+    # doesn't pay Jinja's parse/compile cost
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
     logger.info("Flask app created")
     return app
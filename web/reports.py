@@ -4,8 +4,15 @@ Helper functions and data-loading logic for the web routes to read
 analysis results from PostgreSQL.
 """
 
+import html
 import json
 import logging
+import math
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from operator import attrgetter, itemgetter
+from urllib.parse import quote
 
 import chess
 import chess.svg
@@ -14,6 +21,36 @@ import db.queries as dbq
 
 logger = logging.getLogger(__name__)
 
+BOARD_SVG_SIZE = 350
+_SQUARE = chess.svg.SQUARE_SIZE
+_BOARD_OFFSET = 15  # width of chess.svg's coordinate margin
+
+
+# An empty <defs> in any serialisation: <defs />, <defs/>, <defs></defs>
+_EMPTY_DEFS = re.compile(r"\s*<defs\s*(?:/>|>\s*</defs>)")
+
+
+@lru_cache(maxsize=2)
+def _board_frame(orientation):
+    """Split chess.svg's empty board into its <svg> open tag and contents.
+
+    Margin, coordinates and squares only depend on orientation, so they are
+    rendered once (on first use, not at import) and pieces/arrows are
+    filled in per board. The split is on the <svg> element's own tags, and
+    the empty board's <defs> is dropped in whatever form it was written.
+    """
+    svg = chess.svg.board(None, orientation=orientation, size=BOARD_SVG_SIZE)
+    start = svg.find("<svg")
+    open_end = svg.find(">", start) + 1
+    close = svg.rfind("</svg>")
+    if start < 0 or not 0 < open_end <= close:
+        raise ValueError(f"Unexpected chess.svg board markup: {svg[:80]!r}")
+    body = svg[open_end:close]
+    defs = _EMPTY_DEFS.match(body)
+    if defs:
+        body = body[defs.end():]
+    return svg[:open_end], body
+
 
 # ---------------------------------------------------------------------------
 # Pure helper functions
@@ -27,48 +64,166 @@ def group_deviations(candidates):
     (fen, played_move) -> occurrence count, and results maps
     (fen, played_move) -> {"win": N, "loss": N, "draw": N}.
     """
-    groups = {}
+    worst = {}
+    counts = {}
+    results = {}
     for ev in candidates:
         key = (ev.fen_at_deviation, ev.played_move_uci)
-        if key not in groups:
-            groups[key] = []
-        groups[key].append(ev)
+        prev = worst.get(key)
+        if prev is None:
+            worst[key] = ev
+            counts[key] = 1
+            r = results[key] = {"win": 0, "loss": 0, "draw": 0}
+        else:
+            if ev.eval_loss_cp > prev.eval_loss_cp:
+                worst[key] = ev
+            counts[key] += 1
+            r = results[key]
+        if ev.my_result in r:
+            r[ev.my_result] += 1
+
+    deviations = list(worst.values())
+    return deviations, counts, results
 
-    deviations = []
-    counts = {}
-    results = {}
-    for key, evs in groups.items():
-        worst = max(evs, key=lambda e: e.eval_loss_cp)
-        deviations.append(worst)
-        counts[key] = len(evs)
-        r = {"win": 0, "loss": 0, "draw": 0}
-        for e in evs:
-            if e.my_result in r:
-                r[e.my_result] += 1
-        results[key] = r
 
-    return deviations, counts, results
+@lru_cache(maxsize=2048)
+def _board_for(fen):
+    """Parse a FEN once and share the Board across callers.
+
+    The returned board must not be mutated; anything that pushes moves
+    (including Board.san) works on a copy(stack=False).
+    """
+    return chess.Board(fen)
+
+
+def board_piece_defs():
+    """Hidden <svg> defining every piece symbol once for a whole page.
+
+    Boards rendered with piece_defs=False reference these ids instead of
+    each carrying their own copy of the piece paths.
+    """
+    return (
+        '<svg xmlns="http://www.w3.org/2000/svg" width="0" height="0" '
+        'style="position:absolute" aria-hidden="true"><defs>'
+        + "".join(chess.svg.PIECES.values())
+        + "</defs></svg>"
+    )
 
 
-def render_board_svg(fen, move_uci, color, arrow_color):
-    """Render an SVG chessboard with an arrow for a move."""
-    board = chess.Board(fen)
+# Each entry is a whole board SVG (~23KB without piece defs), so keep
+# roughly one report's worth: two boards per card for ~128 cards
+@lru_cache(maxsize=256)
+def render_board_svg(fen, move_uci, color, arrow_color, piece_defs=True):
+    """Render an SVG chessboard with an arrow for a move.
+
+    Produces the same drawing as chess.svg.board(size=350) by formatting
+    pieces and the arrow into a pre-rendered frame instead of building an
+    ElementTree. With piece_defs=False the piece <defs> are left out, for
+    pages that include board_piece_defs() once. Memoized: the same
+    deviation board is requested on every page load.
+    """
+    board = _board_for(fen)
     orientation = chess.WHITE if color == "white" else chess.BLACK
-    arrows = []
+    head, squares = _board_frame(orientation)
+
+    defs = "".join(
+        chess.svg.PIECES[chess.Piece(piece_type, piece_color).symbol()]
+        for piece_color in chess.COLORS
+        for piece_type in chess.PIECE_TYPES
+        if board.pieces_mask(piece_type, piece_color)
+    ) if piece_defs else ""
+
+    parts = [head, "<defs>", defs, "</defs>", squares]
+    for square, piece in sorted(board.piece_map().items()):
+        x, y = _square_xy(square, orientation)
+        href = f"#{chess.COLOR_NAMES[piece.color]}-{chess.PIECE_NAMES[piece.piece_type]}"
+        parts.append(
+            f'<use href="{href}" xlink:href="{href}" '
+            f'transform="translate({x:d}, {y:d})" />'
+        )
     if move_uci:
         move = chess.Move.from_uci(move_uci)
-        arrows = [chess.svg.Arrow(move.from_square, move.to_square, color=arrow_color)]
-    return chess.svg.board(board, arrows=arrows, orientation=orientation, size=350)
+        parts.append(_arrow_svg(move.from_square, move.to_square,
+                                orientation, html.escape(arrow_color)))
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+def _square_xy(square, orientation):
+    """Top-left corner of a square in board SVG coordinates."""
+    file_index = chess.square_file(square)
+    rank_index = chess.square_rank(square)
+    x = (file_index if orientation else 7 - file_index) * _SQUARE + _BOARD_OFFSET
+    y = (7 - rank_index if orientation else rank_index) * _SQUARE + _BOARD_OFFSET
+    return x, y
+
 
+def _arrow_svg(tail, head, orientation, color):
+    """Draw an arrow with chess.svg's geometry (shaft plus triangular head).
+
+    Like chess.svg, a move that starts and ends on the same square (such
+    as the null move "0000") is drawn as a circle around that square.
+    """
+    x, y = _square_xy(tail, orientation)
+    xtail, ytail = x + _SQUARE / 2, y + _SQUARE / 2
+    x, y = _square_xy(head, orientation)
+    xhead, yhead = x + _SQUARE / 2, y + _SQUARE / 2
+
+    if tail == head:
+        return (
+            f'<circle cx="{xhead}" cy="{yhead}" r="{_SQUARE * 0.9 / 2}" '
+            f'stroke-width="{_SQUARE * 0.1}" stroke="{color}" fill="none" '
+            f'class="circle" />'
+        )
+
+    marker_size = 0.75 * _SQUARE
+    marker_margin = 0.1 * _SQUARE
+    dx, dy = xhead - xtail, yhead - ytail
+    hypot = math.hypot(dx, dy)
+
+    shaft_x = xhead - dx * (marker_size + marker_margin) / hypot
+    shaft_y = yhead - dy * (marker_size + marker_margin) / hypot
+    xtip = xhead - dx * marker_margin / hypot
+    ytip = yhead - dy * marker_margin / hypot
+
+    marker = [(xtip, ytip),
+              (shaft_x + dy * 0.5 * marker_size / hypot,
+               shaft_y - dx * 0.5 * marker_size / hypot),
+              (shaft_x - dy * 0.5 * marker_size / hypot,
+               shaft_y + dx * 0.5 * marker_size / hypot)]
+    points = " ".join(f"{px},{py}" for px, py in marker)
+
+    return (
+        f'<line x1="{xtail}" y1="{ytail}" x2="{shaft_x}" y2="{shaft_y}" '
+        f'stroke="{color}" stroke-width="{_SQUARE * 0.2}" '
+        f'stroke-linecap="butt" class="arrow" />'
+        f'<polygon points="{points}" fill="{color}" class="arrow" />'
+    )
 
+
+@lru_cache(maxsize=8192)
 def move_to_san(fen, move_uci):
     """Convert a UCI move to SAN notation given a FEN position."""
     if not move_uci:
         return "N/A"
-    board = chess.Board(fen)
+    return _san(_board_for(fen).copy(stack=False), move_uci)
+
+
+@lru_cache(maxsize=4096)
+def _sans_for(fen, move_ucis):
+    """Convert several UCI moves from one position to SAN.
+
+    Same rules as move_to_san, but the position is copied once for the
+    whole tuple rather than once per move.
+    """
+    board = _board_for(fen).copy(stack=False)
+    return tuple(_san(board, uci) if uci else "N/A" for uci in move_ucis)
+
+
+def _san(board, move_uci):
+    """SAN for move_uci on board, falling back to the UCI string."""
     try:
-        move = chess.Move.from_uci(move_uci)
-        return board.san(move)
+        return board.san(chess.Move.from_uci(move_uci))
     except (ValueError, chess.IllegalMoveError):
         return move_uci
 
@@ -88,12 +243,19 @@ def format_clock(seconds):
     return f"{m}:{s:02d}"
 
 
+# Move-number labels indexed by ply // 2; deviations past move 100 are
+# formatted on the fly
+_WHITE_MOVE_LABELS = tuple(f"{n}." for n in range(1, 101))
+_BLACK_MOVE_LABELS = tuple(f"{n}..." for n in range(1, 101))
+
+
 def ply_to_move_label(ply, color):
     """Convert a 0-based ply to a human-readable move number."""
-    move_num = (ply // 2) + 1
-    if color == "white" or ply % 2 == 0:
-        return f"{move_num}."
-    return f"{move_num}..."
+    black = color != "white" and ply % 2
+    try:
+        return (_BLACK_MOVE_LABELS if black else _WHITE_MOVE_LABELS)[ply // 2]
+    except IndexError:
+        return f"{ply // 2 + 1}{'...' if black else '.'}"
 
 
 def format_date(dt):
@@ -103,13 +265,31 @@ def format_date(dt):
     return f"{dt.strftime('%B')} {dt.day}, {dt.year}"
 
 
+_CHESSCOM_PREFIXES = (
+    "https://www.chess.com/", "https://chess.com/",
+    "http://www.chess.com/", "http://chess.com/",
+)
+_LICHESS_PREFIXES = ("https://lichess.org/", "http://lichess.org/")
+
+
+def _platform_of(game_url):
+    """Classify a game URL as 'chesscom', 'lichess' or 'unknown'."""
+    if game_url:
+        if game_url.startswith(_CHESSCOM_PREFIXES):
+            return "chesscom"
+        if game_url.startswith(_LICHESS_PREFIXES):
+            return "lichess"
+    return "unknown"
+
+
 def _endgame_deep_link(game_url, ply):
     """Build a deep link to a specific move in a chess game."""
     if not game_url or not ply:
         return game_url or ""
-    if "lichess.org" in game_url:
+    platform = _platform_of(game_url)
+    if platform == "lichess":
         return f"{game_url}#{ply + 1}"
-    if "chess.com" in game_url:
+    if platform == "chesscom":
         analysis_url = game_url.replace(
             "chess.com/game/", "chess.com/analysis/game/"
         )
@@ -117,19 +297,49 @@ def _endgame_deep_link(game_url, ply):
     return game_url
 
 
+@dataclass(slots=True)
+class DeviationItem:
+    """Template data for one deviation card.
+
+    Slotted rather than a dict: Jinja tries attribute access first, so
+    item.field on a dict goes through a failed getattr on every lookup.
+    """
+    eco_name: str
+    eco_code: str
+    color: str
+    card_class: str
+    eval_loss_display: str
+    eval_loss_class: str
+    eval_display: str
+    eval_class: str
+    move_label: str
+    played_san: str
+    best_san: str
+    book_moves: str
+    fen: str
+    best_move_uci: str
+    played_move_uci: str
+    times_played: int
+    times_class: str
+    game_url: str
+    game_link_detail: str
+    eval_loss_raw: int
+    win_pct: int
+    loss_pct: int
+    result_class: str
+    time_class: str
+    platform: str
+    opponent_name: str
+    game_date: str
+    game_date_iso: str
+
+
 def prepare_deviation(ev, deviation_counts, deviation_results):
     """Prepare template data for a single deviation."""
-    played_san = move_to_san(ev.fen_at_deviation, ev.played_move_uci)
-    best_san = move_to_san(ev.fen_at_deviation, ev.best_move_uci)
-
-    board = chess.Board(ev.fen_at_deviation)
-    book_sans = []
-    for uci in ev.book_moves_uci:
-        try:
-            m = chess.Move.from_uci(uci)
-            book_sans.append(board.san(m))
-        except (ValueError, chess.IllegalMoveError):
-            book_sans.append(uci)
+    played_san, best_san, *book_sans = _sans_for(
+        ev.fen_at_deviation,
+        (ev.played_move_uci, ev.best_move_uci, *ev.book_moves_uci),
+    )
 
     # Eval loss display (primary)
     eval_loss_pawns = ev.eval_loss_cp / 100.0
@@ -153,74 +363,91 @@ def prepare_deviation(ev, deviation_counts, deviation_results):
     win_pct = round(100 * r["win"] / r_total) if r_total else 0
     loss_pct = round(100 * r["loss"] / r_total) if r_total else 0
 
-    return {
-        "eco_name": ev.eco_name,
-        "eco_code": ev.eco_code or "?",
-        "color": ev.my_color,
-        "eval_loss_display": loss_display,
-        "eval_loss_class": "bad" if ev.eval_loss_cp > 0 else "good",
-        "eval_display": f"{sign}{eval_pawns:.1f}",
-        "eval_class": "good" if ev.eval_cp >= 0 else "bad",
-        "move_label": move_label,
-        "played_san": played_san,
-        "best_san": best_san,
-        "book_moves": ", ".join(book_sans) if book_sans else "None in book",
-        "fen": ev.fen_at_deviation,
-        "best_move_uci": ev.best_move_uci,
-        "played_move_uci": ev.played_move_uci,
-        "times_played": count,
-        "game_url": ev.game_url,
-        "eval_loss_raw": ev.eval_loss_cp,
-        "win_pct": win_pct,
-        "loss_pct": loss_pct,
-        "time_class": ev.time_class or "unknown",
-        "platform": (
-            "lichess" if "lichess.org" in ev.game_url
-            else "chesscom" if ev.game_url
-            else "unknown"
-        ),
-        "opponent_name": ev.opponent_name or "",
-        "game_date": format_date(ev.end_time),
-        "game_date_iso": (
+    # "(vs opponent, blitz, June 15, 2025)" suffix on the example game link
+    time_class = ev.time_class or "unknown"
+    game_date = format_date(ev.end_time)
+    game_link_detail = ", ".join(filter(None, (
+        f"vs {ev.opponent_name}" if ev.opponent_name else "",
+        time_class if time_class != "unknown" else "",
+        game_date,
+    )))
+
+    return DeviationItem(
+        eco_name=ev.eco_name,
+        eco_code=ev.eco_code or "?",
+        color=ev.my_color,
+        card_class="positive" if ev.eval_loss_cp <= 0 else "",
+        eval_loss_display=loss_display,
+        eval_loss_class="bad" if ev.eval_loss_cp > 0 else "good",
+        eval_display=f"{sign}{eval_pawns:.1f}",
+        eval_class="good" if ev.eval_cp >= 0 else "bad",
+        move_label=move_label,
+        played_san=played_san,
+        best_san=best_san,
+        book_moves=", ".join(book_sans) if book_sans else "None in book",
+        fen=ev.fen_at_deviation,
+        best_move_uci=ev.best_move_uci,
+        played_move_uci=ev.played_move_uci,
+        times_played=count,
+        times_class="recurring" if count > 1 else "",
+        game_url=ev.game_url,
+        game_link_detail=game_link_detail,
+        eval_loss_raw=ev.eval_loss_cp,
+        win_pct=win_pct,
+        loss_pct=loss_pct,
+        result_class="win-high" if win_pct >= 50 else "win-low",
+        time_class=time_class,
+        platform=_platform_of(ev.game_url),
+        opponent_name=ev.opponent_name or "",
+        game_date=game_date,
+        game_date_iso=(
             ev.end_time.strftime("%Y-%m-%d") if ev.end_time else ""
         ),
-    }
+    )
 
 
 def get_opening_groups(deviations):
     """Group deviations by opening+color for sidebar navigation."""
     groups = {}
     for ev in deviations:
-        key = f"{ev.eco_code or 'Unknown'}_{ev.my_color}"
-        if key not in groups:
-            groups[key] = {
-                "eco_code": ev.eco_code or "Unknown",
+        eco_code = ev.eco_code or "Unknown"
+        key = (eco_code, ev.my_color)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = {
+                "eco_code": eco_code,
                 "eco_name": ev.eco_name,
                 "color": ev.my_color,
                 "count": 0,
             }
-        groups[key]["count"] += 1
-    return sorted(groups.values(), key=lambda g: g["count"], reverse=True)
+        group["count"] += 1
+    return sorted(groups.values(), key=itemgetter("count"), reverse=True)
 
 
 # ---------------------------------------------------------------------------
 # Data loaders (read from PostgreSQL)
 # ---------------------------------------------------------------------------
 
-def load_openings_data(chesscom_user, lichess_user):
-    """Load all opening evaluation data for a user from PostgreSQL."""
+def load_openings_data(chesscom_user, lichess_user, eco=None, color=None):
+    """Load all opening evaluation data for a user from PostgreSQL.
+
+    If eco and color are given, only deviations in that opening are
+    prepared as items; groups and summary stats always cover every
+    deviation.
+    """
     username = chesscom_user or lichess_user
     logger.debug("Loading openings data for user=%s", username)
     evaluations = dbq.get_all_evaluations_for_user(username, depth=14)
 
-    # Filter to player deviations that have coaching data
-    candidates = [
-        ev for ev in evaluations
-        if ev.deviating_side == ev.my_color
-        and ev.fen_at_deviation
-        and ev.played_move_uci
-        and not ev.is_fully_booked
-    ]
+    # Filter to player deviations that have coaching data; everything else
+    # (fully booked, or the opponent left book first) counts as theory known
+    candidates = []
+    in_theory = 0
+    for ev in evaluations:
+        if ev.is_fully_booked or ev.deviating_side != ev.my_color:
+            in_theory += 1
+        elif ev.fen_at_deviation and ev.played_move_uci:
+            candidates.append(ev)
 
     # Group by position + played move, keep worst instance per group
     deviations, deviation_counts, deviation_results = group_deviations(
@@ -228,7 +455,7 @@ def load_openings_data(chesscom_user, lichess_user):
     )
 
     # Sort worst first (biggest eval loss = biggest mistake)
-    deviations.sort(key=lambda ev: ev.eval_loss_cp, reverse=True)
+    deviations.sort(key=attrgetter("eval_loss_cp"), reverse=True)
 
     # Summary stats
     total_games_analyzed = len(evaluations)
@@ -237,17 +464,7 @@ def load_openings_data(chesscom_user, lichess_user):
         if deviations else 0
     )
     theory_knowledge_pct = (
-        round(
-            100
-            * sum(
-                1
-                for ev in evaluations
-                if ev.is_fully_booked or ev.deviating_side != ev.my_color
-            )
-            / len(evaluations)
-        )
-        if evaluations
-        else 0
+        round(100 * in_theory / len(evaluations)) if evaluations else 0
     )
     accuracy_pct = (
         round(
@@ -259,10 +476,13 @@ def load_openings_data(chesscom_user, lichess_user):
         else 0
     )
 
-    # Pre-compute item dicts
+    # Pre-compute item dicts (SAN conversion is the expensive part, so
+    # skip deviations outside the requested opening)
     items = [
         prepare_deviation(ev, deviation_counts, deviation_results)
         for ev in deviations
+        if eco is None
+        or ((ev.eco_code or "?") == eco and ev.my_color == color)
     ]
     groups = get_opening_groups(deviations)
 
@@ -362,16 +582,24 @@ def load_endgames_data(chesscom_user, lichess_user):
                 s.get("tc_breakdown", {})
             )
 
-            # Compact per-game details for cross-filtering in JS
-            # Includes clock data so JS can recalculate averages
+            # Query string for the card's "show all games" links
+            entry["all_games_query"] = (
+                f"def={quote(defn)}&type={quote(s['type'])}"
+                f"&balance={quote(s['balance'])}"
+            )
+
+            # Compact per-game details for cross-filtering in JS (including
+            # clock data so JS can recalculate averages), plus one example
+            # candidate per (tc, platform, color) combo so JS can pick one
+            # matching the active filters
             game_details = []
+            seen_keys = set()
+            candidates = []
             for g in s.get("all_games", []):
                 url = g.get("game_url", "")
-                plat = (
-                    "chesscom" if "chess.com" in url
-                    else "lichess" if "lichess.org" in url
-                    else "unknown"
-                )
+                plat = _platform_of(url)
+                tc = g.get("time_class", "")
+                color = g.get("my_color", "white")
                 et = g.get("end_time")
                 dt = (
                     et.strftime("%Y-%m-%d")
@@ -380,9 +608,9 @@ def load_endgames_data(chesscom_user, lichess_user):
                 )
                 gd = {
                     "r": g.get("my_result", "draw"),
-                    "tc": g.get("time_class", ""),
+                    "tc": tc,
                     "p": plat,
-                    "c": g.get("my_color", "white"),
+                    "c": color,
                     "d": dt,
                 }
                 mc = g.get("my_clock")
@@ -392,28 +620,13 @@ def load_endgames_data(chesscom_user, lichess_user):
                 if oc is not None:
                     gd["oc"] = round(oc, 1)
                 game_details.append(gd)
-            entry["game_details_json"] = json.dumps(game_details)
 
-            # Example candidates: one per (tc, platform, color) combo
-            # so JS can pick one matching the active filters
-            seen_keys = set()
-            candidates = []
-            for g in s.get("all_games", []):
                 if not g.get("fen"):
                     continue
-                tc = g.get("time_class", "")
-                url = g.get("game_url", "")
-                plat = (
-                    "chesscom" if "chess.com" in url
-                    else "lichess" if "lichess.org" in url
-                    else "unknown"
-                )
-                color = g.get("my_color", "white")
                 ckey = (tc, plat, color)
                 if ckey in seen_keys:
                     continue
                 seen_keys.add(ckey)
-                et = g.get("end_time")
                 candidates.append({
                     "fen": g["fen"],
                     "color": color,
@@ -426,6 +639,7 @@ def load_endgames_data(chesscom_user, lichess_user):
                     "opp": g.get("opponent_name", ""),
                     "date": format_date(et),
                 })
+            entry["game_details_json"] = json.dumps(game_details)
             entry["example_candidates_json"] = json.dumps(candidates)
             enriched.append(entry)
 
@@ -479,9 +693,10 @@ def load_endgames_all_data(chesscom_user, lichess_user, defn, eg_type,
             ply = g.get("endgame_ply", 0)
             entry["deep_link"] = ""
             if game_url and ply:
-                if "lichess.org" in game_url:
+                platform = _platform_of(game_url)
+                if platform == "lichess":
                     entry["deep_link"] = f"{game_url}#{ply + 1}"
-                elif "chess.com" in game_url:
+                elif platform == "chesscom":
                     analysis_url = game_url.replace(
                         "chess.com/game/", "chess.com/analysis/game/"
                     )
@@ -544,9 +759,7 @@ def _aggregate_endgames(raw, game_meta=None):
                 continue
             balance = _material_balance_label(info.material_diff)
             key = (defn, info.endgame_type, balance)
-            if key not in buckets:
-                buckets[key] = []
-            buckets[key].append({
+            buckets.setdefault(key, []).append({
                 "game_url": info.game_url or game_url,
                 "fen": info.fen_at_endgame,
                 "endgame_ply": info.endgame_ply,
@@ -583,15 +796,16 @@ def _aggregate_endgames(raw, game_meta=None):
         tc_breakdown = {}
         for g in games:
             tc = g.get("time_class", "")
-            if tc not in tc_breakdown:
-                tc_breakdown[tc] = {"wins": 0, "losses": 0, "draws": 0}
+            tc_counts = tc_breakdown.get(tc)
+            if tc_counts is None:
+                tc_counts = tc_breakdown[tc] = {"wins": 0, "losses": 0, "draws": 0}
             r = g.get("my_result", "draw")
             if r == "win":
-                tc_breakdown[tc]["wins"] += 1
+                tc_counts["wins"] += 1
             elif r == "loss":
-                tc_breakdown[tc]["losses"] += 1
+                tc_counts["losses"] += 1
             else:
-                tc_breakdown[tc]["draws"] += 1
+                tc_counts["draws"] += 1
 
         entry = {
             "type": etype,
@@ -621,13 +835,11 @@ def _aggregate_endgames(raw, game_meta=None):
             "tc_breakdown": tc_breakdown,
         }
 
-        if defn not in by_def:
-            by_def[defn] = []
-        by_def[defn].append(entry)
+        by_def.setdefault(defn, []).append(entry)
 
     # Sort each definition's list by total games descending
     for defn in by_def:
-        by_def[defn].sort(key=lambda e: e["total"], reverse=True)
+        by_def[defn].sort(key=itemgetter("total"), reverse=True)
 
     return by_def
 
@@ -2,16 +2,19 @@
 
 import logging
 import re
+import threading
 import urllib.request
 import urllib.error
+from collections import OrderedDict
 from datetime import datetime, timezone
 
-from flask import redirect, render_template, request, jsonify, url_for
+from flask import Response, redirect, render_template, request, jsonify, url_for
+from markupsafe import Markup
 
 from web.utils import parse_user_path, build_user_path
 from web.reports import (
     load_openings_data, load_endgames_data, load_endgames_all_data,
-    render_board_svg,
+    render_board_svg, board_piece_defs,
 )
 from db import queries
 
@@ -20,6 +23,10 @@ logger = logging.getLogger(__name__)
 # Validation pattern: alphanumeric, underscores, hyphens
 USERNAME_PATTERN = re.compile(r'^[a-zA-Z0-9_-]+$')
 MAX_USERNAME_LEN = 25
+# Arrow colours accepted from the render-boards API: #rgb up to #rrggbbaa
+ARROW_COLOR_PATTERN = re.compile(r'#[0-9a-fA-F]{3,8}')
+DEFAULT_ARROW_COLOR = '#22c55e'
+REPORT_CACHE_SIZE = 128  # rendered report pages kept per app
 
 
 def validate_username(username):
@@ -61,6 +68,31 @@ def check_username_exists(platform, username):
 def register_routes(app):
     """Register all routes on the Flask app."""
 
+    # Pages that fetch boards from the render-boards API include the piece
+    # symbols once; the API then leaves them out of every board.
+    app.jinja_env.globals['board_piece_defs'] = Markup(board_piece_defs())
+
+    # Rendered report pages keyed by (path, job id, completion time). A
+    # completed job's report only changes when a new job is created for
+    # the user, which gives the key a new job id.
+    report_cache = OrderedDict()
+    report_cache_lock = threading.Lock()
+    app.extensions['report_cache'] = report_cache
+
+    def cached_report(job, render):
+        key = (request.path, job['id'], job.get('completed_at'))
+        with report_cache_lock:
+            body = report_cache.get(key)
+            if body is not None:
+                report_cache.move_to_end(key)
+        if body is None:
+            body = render().encode('utf-8')
+            with report_cache_lock:
+                report_cache[key] = body
+                if len(report_cache) > REPORT_CACHE_SIZE:
+                    report_cache.popitem(last=False)
+        return Response(body, mimetype='text/html')
+
     @app.route('/')
     def landing():
         return render_template('landing.html')
@@ -168,16 +200,20 @@ def register_routes(app):
                                        user_path=user_path,
                                        chesscom_user=chesscom or '',
                                        lichess_user=lichess or '')
-            logger.info("Loading report for %s (job %s)", user_path, job['id'])
-            data = load_openings_data(chesscom, lichess)
-            data['user_path'] = user_path
-            data['page'] = 'openings'
-            data['filter_eco'] = None
-            data['filter_color'] = None
-            # Endgame count for sidebar
-            eg_data = load_endgames_data(chesscom, lichess)
-            data['endgame_count'] = eg_data['endgame_count']
-            return render_template('openings.html', **data)
+
+            def render():
+                logger.info("Loading report for %s (job %s)", user_path, job['id'])
+                data = load_openings_data(chesscom, lichess)
+                data['user_path'] = user_path
+                data['page'] = 'openings'
+                data['filter_eco'] = None
+                data['filter_color'] = None
+                # Endgame count for sidebar
+                eg_data = load_endgames_data(chesscom, lichess)
+                data['endgame_count'] = eg_data['endgame_count']
+                return render_template('openings.html', **data)
+
+            return cached_report(job, render)
 
         if job['status'] in ('pending', 'fetching', 'analyzing'):
             return redirect(f'/u/{user_path}/status')
@@ -194,19 +230,24 @@ def register_routes(app):
     @app.route('/u/<path:user_path>/opening/<eco>/<color>')
     def opening_detail(user_path, eco, color):
         chesscom, lichess = parse_user_path(user_path)
-        data = load_openings_data(chesscom, lichess)
-        # Filter items to matching eco/color
-        data['items'] = [
-            item for item in data['items']
-            if item['eco_code'] == eco and item['color'] == color
-        ]
-        data['user_path'] = user_path
-        data['page'] = 'openings'
-        data['filter_eco'] = eco
-        data['filter_color'] = color
-        eg_data = load_endgames_data(chesscom, lichess)
-        data['endgame_count'] = eg_data['endgame_count']
-        return render_template('openings.html', **data)
+
+        def render():
+            data = load_openings_data(chesscom, lichess, eco=eco, color=color)
+            data['user_path'] = user_path
+            data['page'] = 'openings'
+            data['filter_eco'] = eco
+            data['filter_color'] = color
+            eg_data = load_endgames_data(chesscom, lichess)
+            data['endgame_count'] = eg_data['endgame_count']
+            return render_template('openings.html', **data)
+
+        job = queries.get_latest_job(
+            chesscom_user=chesscom,
+            lichess_user=lichess,
+        )
+        if job and job['status'] == 'complete':
+            return cached_report(job, render)
+        return render()
 
     @app.route('/u/<path:user_path>/endgames')
     def endgame_summary(user_path):
@@ -236,9 +277,15 @@ def register_routes(app):
         specs = request.get_json()
         results = []
         for s in specs:
+            # The colour is written into SVG attributes that the page
+            # injects as markup, so only plain hex colours get through
+            arrow_color = s.get('arrow_color')
+            if (not isinstance(arrow_color, str)
+                    or ARROW_COLOR_PATTERN.fullmatch(arrow_color) is None):
+                arrow_color = DEFAULT_ARROW_COLOR
             svg = render_board_svg(
                 s['fen'], s.get('move'), s['color'],
-                s.get('arrow_color', ''))
+                arrow_color, piece_defs=False)
             results.append(svg)
         return jsonify(results)
 